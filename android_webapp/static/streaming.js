@@ -9,6 +9,13 @@ class FrameStreamingClient {
         this.sessionId = options.sessionId;
         this.path = options.path;
         this.transports = options.transports;
+        // Ask for binary 'frames_batch' messages instead of one base64 'frame' event each
+        this.binaryBatch = options.binaryBatch !== false;
+        this.frameUrl = null;
+        // With a canvas, frames are composited there and the server sends
+        // dirty-rect 'frame:delta' patches instead of unchanged full frames
+        this.canvas = options.canvas || null;
+        this.drawChain = Promise.resolve();
         this.onFrame = options.onFrame || (() => {});
         this.onError = options.onError || (() => {});
         this.onConnect = options.onConnect || (() => {});
@@ -132,8 +139,10 @@ class FrameStreamingClient {
         /**
          * Frame Events
          */
-        this.socket.on('frame', (data) => {
+        // Acknowledge frames so the server can apply backpressure
+        this.socket.on('frame', (data, ack) => {
             this.handleFrame(data);
+            if (ack) ack();
         });
         
         this.socket.on('frame:data', (data) => {
@@ -141,13 +150,19 @@ class FrameStreamingClient {
             this.handleFrame(data);
         });
         
+        this.socket.on('frame:delta', (data, ack) => {
+            this.handleDelta(data);
+            if (ack) ack();
+        });
+        
+        this.socket.on('frames_batch', (buffer, ack) => {
+            this.handleFrameBatch(buffer);
+            if (ack) ack();
+        });
+        
         /**
          * Input Acknowledgment Events
          */
-        this.socket.on('input:acknowledged', (data) => {
-            console.log('[Streaming] Input acknowledged:', data.type);
-        });
-        
         this.socket.on('input:click:response', (data) => {
             if (!data.success) {
                 console.warn('[Streaming] Click failed:', data.message);
@@ -231,11 +246,17 @@ class FrameStreamingClient {
                 this.stats.lastBandwidthMbps = bps / 1_000_000;
             }
             
+            if (this.canvas) {
+                this.drawOnCanvas(data.image, 0, 0);
+            }
+            
             // Callback with frame data
             // Note: data.image already contains the full data URL with prefix
             this.onFrame({
                 image: data.image,
                 timestamp: data.timestamp || now,
+                // Frames are downscaled on slow links; input coordinates must be divided by this
+                scale: (data.stats && data.stats.scale) || 1,
                 stats: {
                     frameNumber: this.frameCount,
                     latency: this.stats.frameLatency,
@@ -261,6 +282,75 @@ class FrameStreamingClient {
         }
     }
     
+    drawOnCanvas(src, x, y, revoke = false) {
+        /**
+         * Draw an image onto the canvas; draws are chained so patches land in order
+         */
+        const ctx = this.canvas.getContext('2d');
+        this.drawChain = this.drawChain.then(() => new Promise((resolve) => {
+            const img = new Image();
+            img.onload = () => {
+                if (x === 0 && y === 0 && (this.canvas.width !== img.width || this.canvas.height !== img.height)) {
+                    this.canvas.width = img.width;
+                    this.canvas.height = img.height;
+                }
+                ctx.drawImage(img, x, y);
+                resolve();
+            };
+            img.onerror = () => resolve();
+            img.src = src;
+        }).finally(() => {
+            if (revoke) {
+                URL.revokeObjectURL(src);
+            }
+        }));
+    }
+    
+    handleDelta(data) {
+        /**
+         * Handle a dirty-rect patch: data = {rect: [x, y, w, h], image: ArrayBuffer of JPEG bytes}
+         */
+        if (!this.canvas || !data.image || !data.rect) {
+            return;
+        }
+        this.frameCount++;
+        this.stats.framesReceived++;
+        this.stats.bytesReceived += data.image.byteLength;
+        const src = URL.createObjectURL(new Blob([data.image], { type: 'image/jpeg' }));
+        this.drawOnCanvas(src, data.rect[0], data.rect[1], true);
+    }
+    
+    handleFrameBatch(buffer) {
+        /**
+         * Handle a binary batch of length-prefixed JPEGs (big-endian uint32 + bytes)
+         * Only the newest frame is shown; older ones in the batch are already stale
+         */
+        const view = new DataView(buffer);
+        let offset = 0;
+        let lastStart = -1;
+        let lastLength = 0;
+        while (offset + 4 <= buffer.byteLength) {
+            const length = view.getUint32(offset);
+            lastStart = offset + 4;
+            lastLength = length;
+            offset = lastStart + length;
+        }
+        if (lastStart < 0) {
+            return;
+        }
+        
+        const blob = new Blob([new Uint8Array(buffer, lastStart, lastLength)], { type: 'image/jpeg' });
+        if (this.frameUrl) {
+            URL.revokeObjectURL(this.frameUrl);
+        }
+        this.frameUrl = URL.createObjectURL(blob);
+        this.handleFrame({
+            image: this.frameUrl,
+            size: buffer.byteLength,
+            timestamp: Date.now()
+        });
+    }
+    
     subscribe(sessionId) {
         /**
          * Subscribe to frame stream for a session
@@ -286,7 +376,9 @@ class FrameStreamingClient {
         console.log('[Streaming] Subscribing to session:', sessionId);
         
         this.socket.emit('subscribe', {
-            session_id: sessionId
+            session_id: sessionId,
+            binary_batch: this.binaryBatch,
+            delta: Boolean(this.canvas)
         });
     }
     
@@ -7,7 +7,7 @@ Designed to be loaded in an Android WebView.
 import os
 import logging
 import requests
-from flask import Flask, render_template_string, request, jsonify, redirect
+from flask import Flask, Response, request, jsonify, redirect
 from flask_cors import CORS
 
 # Configure logging
@@ -990,6 +990,7 @@ VIEWER_TEMPLATE = """
         let frameCount = 0;
         let lastFpsUpdate = Date.now();
         let consecutiveErrors = 0;
+        let frameScale = 1;  // Server-side downscale of the displayed frame
         const MAX_ERRORS = 5;
         let isSubscribed = false;
         let isInitialized = false;
@@ -1040,6 +1041,7 @@ VIEWER_TEMPLATE = """
                     onFrame: (frameData) => {
                         // Update image source
                         browserFrame.src = frameData.image;
+                        frameScale = frameData.scale || 1;
                         browserFrame.classList.add('loaded');
 
                         // Hide loading indicator on first frame
@@ -1207,8 +1209,9 @@ VIEWER_TEMPLATE = """
             const scaleX = imgNaturalWidth / rect.width;
             const scaleY = imgNaturalHeight / rect.height;
             
-            const x = Math.round((clientX - rect.left) * scaleX);
-            const y = Math.round((clientY - rect.top) * scaleY);
+            // Map back to the browser's viewport when the frame was sent downscaled
+            const x = Math.round((clientX - rect.left) * scaleX / frameScale);
+            const y = Math.round((clientY - rect.top) * scaleY / frameScale);
             
             return { x, y };
         }
@@ -1402,11 +1405,20 @@ VIEWER_TEMPLATE = """
 </html>
 """
 
+# Templates are compiled once at import through the app's Jinja environment
+# (same autoescaping as render_template_string). The launcher only depends on
+# the static app list, so it is rendered once as well.
+LAUNCHER_PAGE = app.jinja_env.from_string(LAUNCHER_TEMPLATE).render(apps=WEBSITE_APPS)
+VIEWER_PAGE_TEMPLATE = app.jinja_env.from_string(VIEWER_TEMPLATE, globals={
+    'STREAMING_CLIENT_JS': STREAMING_CLIENT_JS,
+    'PUBLIC_RENDERER_URL': PUBLIC_RENDERER_URL
+})
+
 
 @app.route('/')
 def home():
     """Main launcher page"""
-    return render_template_string(LAUNCHER_TEMPLATE, apps=WEBSITE_APPS)
+    return Response(LAUNCHER_PAGE, mimetype='text/html')
 
 
 @app.route('/viewer')
@@ -1415,13 +1427,7 @@ def viewer():
     session_id = request.args.get('session', '')
     app_name = request.args.get('app', 'Website')
     
-    return render_template_string(
-        VIEWER_TEMPLATE,
-        session_id=session_id,
-        app_name=app_name,
-        STREAMING_CLIENT_JS=STREAMING_CLIENT_JS,
-        PUBLIC_RENDERER_URL=PUBLIC_RENDERER_URL
-    )
+    return VIEWER_PAGE_TEMPLATE.render(session_id=session_id, app_name=app_name)
 
 
 @app.route('/api/apps')
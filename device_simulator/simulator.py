@@ -11,7 +11,7 @@ import time
 import logging
 import argparse
 import requests
-from flask import Flask, render_template_string, request, jsonify
+from flask import Flask, request, jsonify
 
 # Configure logging
 logging.basicConfig(
@@ -581,8 +581,12 @@ SIMULATOR_TEMPLATE = """
                 await new Promise(resolve => setTimeout(resolve, 2000));
                 
                 // Use noVNC for interactive viewing instead of static frames
-                // The noVNC viewer allows full mouse/keyboard interaction
-                const vncUrl = 'http://localhost:7900/?autoconnect=1&resize=scale&password=secret';
+                // The noVNC viewer allows full mouse/keyboard interaction.
+                // noVNC already prefers CopyRect/Tight/ZRLE over Raw; a higher
+                // zlib level trades a little server CPU for less bandwidth on
+                // the forwarded (Codespaces) connection.
+                const vncParams = 'autoconnect=1&resize=scale&password=secret&quality=6&compression=6';
+                const vncUrl = `http://localhost:7900/?${vncParams}`;
                 
                 // In Codespaces, we need to use the forwarded port URL
                 let viewerURL;
@@ -592,7 +596,7 @@ SIMULATOR_TEMPLATE = """
                     if (currentUrl.hostname.includes('github.dev') || currentUrl.hostname.includes('githubpreview.dev')) {
                         // GitHub Codespaces format: xxx-8000.xxx.github.dev -> xxx-7900.xxx.github.dev
                         const vncHost = currentUrl.hostname.replace(/-8000\./, '-7900.');
-                        viewerURL = `${currentUrl.protocol}//${vncHost}/?autoconnect=1&resize=scale&password=secret`;
+                        viewerURL = `${currentUrl.protocol}//${vncHost}/?${vncParams}`;
                     } else {
                         viewerURL = vncUrl;
                     }
@@ -722,6 +726,10 @@ SIMULATOR_TEMPLATE = """
 </html>
 """
 
+# Compiled once at import through the app's Jinja environment
+# (same autoescaping as render_template_string)
+SIMULATOR_PAGE_TEMPLATE = app.jinja_env.from_string(SIMULATOR_TEMPLATE)
+
 
 @app.route('/')
 def index():
@@ -735,8 +743,7 @@ def simulator():
     profile_key = request.args.get('profile', DEVICE_PROFILE)
     profile = DEVICE_PROFILES.get(profile_key, DEVICE_PROFILES['threadx_512mb'])
     
-    return render_template_string(
-        SIMULATOR_TEMPLATE,
+    return SIMULATOR_PAGE_TEMPLATE.render(
         profile=profile,
         profiles=DEVICE_PROFILES,
         current_profile_key=profile_key,
@@ -3,6 +3,18 @@ Jio Cloud Apps Renderer Service
 A service that coordinates Selenium browser sessions with WebSocket streaming for remote rendering
 """
 import os
+
+# Run on gevent's event loop when available so blocking Selenium calls, frame
+# pushes and WebSocket I/O yield to each other instead of each pinning an OS
+# thread. Monkey patching has to happen before socket/threading are imported.
+ASYNC_MODE = os.getenv('SOCKETIO_ASYNC_MODE', 'gevent')
+if ASYNC_MODE == 'gevent':
+    try:
+        from gevent import monkey
+        monkey.patch_all()
+    except ImportError:
+        ASYNC_MODE = 'threading'
+
 import logging
 import time
 import base64
@@ -11,19 +23,31 @@ import hashlib
 import shutil
 import glob
 import re
-from flask import Flask, jsonify, request, send_file, render_template_string, Response
+import json
+import socket
+import itertools
+import heapq
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, jsonify, request, send_file, Response
+from flask.json.provider import DefaultJSONProvider
+from markupsafe import escape
 from flask_cors import CORS
+from flask_compress import Compress
 from flask_socketio import SocketIO, emit, disconnect
 from websocket_handler import WebSocketHandler
 from audio_handler import create_audio_streamer
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chromium.remote_connection import ChromiumRemoteConnection
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.action_chains import ActionChains
+from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, WebDriverException
 from io import BytesIO
+from urllib.parse import urlsplit
 from PIL import Image
 import subprocess
 import wave
@@ -37,6 +61,62 @@ except ImportError:
     YT_DLP_AVAILABLE = False
     logging.warning("yt-dlp not available - YouTube streaming will be disabled")
 
+# Try to import pybase64 for SIMD base64 encoding (falls back to stdlib base64)
+try:
+    import pybase64
+    PYBASE64_AVAILABLE = True
+except ImportError:
+    PYBASE64_AVAILABLE = False
+
+# Try to import websocket-client for direct DevTools screenshots (falls back to WebDriver)
+try:
+    import websocket
+    WEBSOCKET_CLIENT_AVAILABLE = True
+except ImportError:
+    WEBSOCKET_CLIENT_AVAILABLE = False
+
+# Try to import orjson for faster JSON responses and Socket.IO packets (falls back to stdlib json)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def b64encode_str(data):
+    """Base64-encode bytes straight to a str"""
+    if PYBASE64_AVAILABLE:
+        return pybase64.b64encode_as_string(data)
+    return base64.b64encode(data).decode('ascii')
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider that serializes with orjson (keys are not sorted)"""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_SERIALIZE_NUMPY).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=orjson.OPT_SERIALIZE_NUMPY)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+class OrjsonPacketCodec:
+    """json-module stand-in for python-socketio packet encoding"""
+
+    @staticmethod
+    def dumps(obj, *args, **kwargs):
+        return orjson.dumps(obj).decode('utf-8')
+
+    @staticmethod
+    def loads(s, *args, **kwargs):
+        return orjson.loads(s)
+
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -45,6 +125,8 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
+if ORJSON_AVAILABLE:
+    app.json = OrjsonProvider(app)
 # Enable CORS with support for all origins, methods, and headers
 CORS(app, resources={
     r"/*": {
@@ -57,8 +139,24 @@ CORS(app, resources={
     }
 })
 
-# Initialize WebSocket support
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
+# Gzip JSON responses (mainly the base64 /frame/data payload); level 1 keeps CPU cost low
+app.config['COMPRESS_MIMETYPES'] = ['application/json']
+app.config['COMPRESS_LEVEL'] = 1
+Compress(app)
+
+# Initialize WebSocket support. SOCKETIO_SERIALIZER=msgpack switches the packet
+# codec to binary msgpack (clients then need socket.io-msgpack-parser)
+SOCKETIO_SERIALIZER = os.getenv('SOCKETIO_SERIALIZER', 'default')
+# Shorter Engine.IO heartbeat than the 25s/20s default so vanished clients stop being encoded for sooner
+SOCKETIO_PING_INTERVAL = int(os.getenv('SOCKETIO_PING_INTERVAL', '10'))
+SOCKETIO_PING_TIMEOUT = int(os.getenv('SOCKETIO_PING_TIMEOUT', '5'))
+# Payloads are mostly JPEG, so gzipping long-polling responses only burns CPU
+socketio = SocketIO(
+    app, cors_allowed_origins="*", async_mode=ASYNC_MODE,
+    serializer=SOCKETIO_SERIALIZER, http_compression=False,
+    ping_interval=SOCKETIO_PING_INTERVAL, ping_timeout=SOCKETIO_PING_TIMEOUT,
+    json=OrjsonPacketCodec if ORJSON_AVAILABLE else json
+)
 
 # Initialize WebSocket handler (will be set when app starts)
 ws_handler = None
@@ -69,8 +167,31 @@ audio_streamer = None
 # Environment configuration
 SELENIUM_HOST = os.getenv('SELENIUM_HOST', 'chrome')
 SELENIUM_PORT = os.getenv('SELENIUM_PORT', '4444')
+SELENIUM_POOL_MAXSIZE = int(os.getenv('SELENIUM_POOL_MAXSIZE', '8'))  # Pooled connections per session
 SESSION_TIMEOUT = int(os.getenv('SESSION_TIMEOUT', '300'))  # 5 minutes default
 FRAME_CAPTURE_INTERVAL = float(os.getenv('FRAME_CAPTURE_INTERVAL', '1.0'))  # 1 second default
+FRAME_JPEG_QUALITY = int(os.getenv('FRAME_JPEG_QUALITY', '75'))
+# Per-frame byte budget for the adaptive JPEG quality controller (0 disables it)
+FRAME_TARGET_BYTES = int(os.getenv('FRAME_TARGET_BYTES', '24000'))
+FRAME_QUALITY_MIN = 35
+FRAME_QUALITY_MAX = 85
+FRAME_QUALITY_STEP = 5
+# Default /frame/data format: 'jpeg' (cached capture) or 'webp' (lossless, for text-heavy pages)
+FRAME_DATA_FORMAT = os.getenv('FRAME_DATA_FORMAT', 'jpeg').lower()
+PAGE_INFO_CACHE_TTL = float(os.getenv('PAGE_INFO_CACHE_TTL', '2.0'))  # Seconds to reuse title/URL lookups
+ENCODE_THREADS = int(os.getenv('ENCODE_THREADS', str(os.cpu_count() or 4)))  # Native threads for JPEG work
+CAPTURE_WORKERS = int(os.getenv('CAPTURE_WORKERS', '8'))  # Shared pool for background frame captures
+INPUT_BATCH_WINDOW = float(os.getenv('INPUT_BATCH_WINDOW', '0.016'))  # Coalesce WebSocket input for one 60Hz frame
+CDP_SCREENSHOTS = os.getenv('CDP_SCREENSHOTS', 'true').lower() == 'true'  # JPEG via Page.captureScreenshot; false = WebDriver PNG only
+CDP_DIRECT = os.getenv('CDP_DIRECT', 'true').lower() == 'true'  # Screenshots over the Grid's DevTools WebSocket
+CAPTURE_SKIP_IDLE = os.getenv('CAPTURE_SKIP_IDLE', 'true').lower() == 'true'  # Skip background captures of unchanged pages
+IDLE_CAPTURE_REFRESH = float(os.getenv('IDLE_CAPTURE_REFRESH', '5.0'))  # Capture anyway after this many seconds
+URL_FRAME_CACHE_TTL = float(os.getenv('URL_FRAME_CACHE_TTL', '0'))  # Seed new sessions with another's fresh frame; 0 (default) disables
+URL_FRAME_CACHE_SIZE = 256
+TCP_USER_TIMEOUT_MS = int(os.getenv('TCP_USER_TIMEOUT_MS', '10000'))  # Drop WebSocket peers with unacked data after this
+
+# Characters allowed in download filenames built from client-supplied session IDs
+FILENAME_UNSAFE = re.compile(r'[^A-Za-z0-9_-]')
 
 # KaiOS client directory - check multiple locations
 KAIOS_CLIENT_DIR = None
@@ -89,15 +210,667 @@ YOUTUBE_CACHE_MAX_AGE_HOURS = int(os.getenv('YOUTUBE_CACHE_MAX_AGE_HOURS', '24')
 # Ensure cache directory exists
 os.makedirs(YOUTUBE_CACHE_DIR, exist_ok=True)
 
-# Store active sessions
+# Store active sessions; sessions_lock guards inserts/removals so that
+# check-then-modify sequences can't race. Plain lookups use .get() unlocked.
 active_sessions = {}
+sessions_lock = threading.Lock()
 
 # YouTube download status tracking
 youtube_downloads = {}
 youtube_downloads_lock = threading.Lock()
 
-# Session cleanup thread
+# Session cleanup thread, woken via cleanup_event when the earliest expiry changes
 cleanup_thread = None
+expiration_heap = []  # (expires_at, session_id), lazily re-validated on pop
+expiration_lock = threading.Lock()
+cleanup_event = threading.Event()
+
+# Source of default session IDs; unique even for requests within the same second
+_session_counter = itertools.count(int(time.time() * 1000))
+
+# Header prepended to /frame/binary payloads: timestamp (double), length (uint32)
+FRAME_HEADER = struct.Struct('!dI')
+
+# MJPEG streaming: part header per JPEG, and how long a stream waits for a new
+# frame before re-checking that its session still exists
+MJPEG_PART_HEADER = b'--frame\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n'
+STREAM_WAIT_TIMEOUT = 1.0
+
+# Downscaled variants (?w=&h= on /frame and /frame/data) kept per session
+SCALED_FRAME_CACHE_SIZE = 4
+
+# Cached /health response body: [built_at, json_bytes]
+HEALTH_CACHE_TTL = 1.0
+_health_cache = [0.0, b'']
+
+
+# KaiOS-like mobile user agent to load mobile versions of websites
+MOBILE_USER_AGENT = 'Mozilla/5.0 (Mobile; rv:48.0) Gecko/48.0 Firefox/48.0 KAIOS/2.5'
+
+
+def _build_chrome_options():
+    """Build the Chrome options shared by every browser session"""
+    chrome_options = Options()
+    chrome_options.add_argument('--no-sandbox')
+    chrome_options.add_argument('--disable-dev-shm-usage')
+    chrome_options.add_argument('--disable-gpu')
+    chrome_options.add_argument('--no-first-run')
+    chrome_options.add_argument('--no-default-browser-check')
+    
+    # Turn off services nothing here uses so they don't compete with rendering
+    # and screenshot capture
+    chrome_options.add_argument('--disable-logging')
+    chrome_options.add_argument('--log-level=3')
+    chrome_options.add_argument('--disable-background-networking')
+    chrome_options.add_argument('--disable-sync')
+    chrome_options.add_argument('--disable-default-apps')
+    chrome_options.add_argument('--disable-translate')
+    chrome_options.add_argument('--metrics-recording-only')
+    chrome_options.add_argument('--mute-audio')
+    
+    # Keep screenshots at CSS pixel size regardless of the host display
+    chrome_options.add_argument('--force-device-scale-factor=1')
+    
+    # Return from driver.get() once the DOM is ready; load_url() waits for
+    # document.readyState == 'complete' itself when asked to
+    chrome_options.page_load_strategy = 'eager'
+    
+    # Use mobile viewport size (320x480) - standard mobile size Chrome can render
+    # Content will be scaled down to 240x320 for KaiOS display
+    chrome_options.add_argument('--window-size=320,480')
+    chrome_options.add_argument('--window-position=0,0')
+    
+    # Force light mode for better readability on small screens
+    chrome_options.add_argument('--force-color-profile=srgb')
+    
+    # Force videos to play inline, not download or open externally
+    chrome_options.add_argument('--autoplay-policy=no-user-gesture-required')
+    
+    # Chrome only honours the last --disable-features switch, so list them all once:
+    # forced dark mode, media engagement autoplay rules and the translate bar
+    chrome_options.add_argument(
+        '--disable-features=WebContentsForceDark,PreloadMediaEngagementData,'
+        'MediaEngagementBypassAutoplayPolicies,TranslateUI'
+    )
+    
+    # Kiosk mode: hide browser UI elements for clean web content view
+    chrome_options.add_argument('--kiosk')
+    chrome_options.add_argument('--start-maximized')
+    chrome_options.add_argument('--disable-infobars')
+    chrome_options.add_argument('--disable-extensions')
+    
+    chrome_options.add_argument(f'--user-agent={MOBILE_USER_AGENT}')
+    
+    # Mobile emulation for proper responsive rendering
+    # Using 320x480 which is a standard mobile size Chrome properly supports
+    mobile_emulation = {
+        'deviceMetrics': {'width': 320, 'height': 480, 'pixelRatio': 1.0},
+        'userAgent': MOBILE_USER_AGENT
+    }
+    chrome_options.add_experimental_option('mobileEmulation', mobile_emulation)
+    
+    # Set preference to prefer light color scheme
+    prefs = {
+        'profile.default_content_setting_values.color_scheme': 1,  # 1 = light
+    }
+    chrome_options.add_experimental_option('prefs', prefs)
+    
+    # Hide browser chrome (address bar, tabs, etc.)
+    chrome_options.add_experimental_option('excludeSwitches', ['enable-automation'])
+    chrome_options.add_experimental_option('useAutomationExtension', False)
+    
+    return chrome_options
+
+
+# Options are identical for every session, so build them once at import
+_CHROME_OPTIONS = _build_chrome_options()
+
+class PooledChromeConnection(ChromiumRemoteConnection):
+    """Keep-alive Chrome connection with a larger urllib3 pool
+    
+    Frame capture, input and page-info commands for one session run on
+    different threads; with the default pool they would queue on a single socket.
+    """
+    
+    def __init__(self, remote_server_addr):
+        super().__init__(remote_server_addr, vendor_prefix='goog', browser_name='chrome', keep_alive=True)
+    
+    def _get_connection_manager(self):
+        manager = super()._get_connection_manager()
+        manager.connection_pool_kw.update(maxsize=SELENIUM_POOL_MAXSIZE, block=False)
+        return manager
+
+
+class CDPConnection:
+    """Direct DevTools WebSocket to a session's page target
+    
+    Talks to the Grid's se:cdp endpoint, which skips the WebDriver HTTP
+    round trip and chromedriver's JSON marshalling. The endpoint is
+    browser-level, so commands are routed to the page through a flattened
+    target session.
+    """
+    
+    def __init__(self, ws_url, target_id, timeout=10):
+        self.ws = websocket.create_connection(ws_url, timeout=timeout)
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.target_session = None
+        result = self.send('Target.attachToTarget', {'targetId': target_id, 'flatten': True})
+        self.target_session = result['sessionId']
+    
+    def send(self, method, params=None):
+        """Send a command and wait for its reply, skipping unrelated events"""
+        with self.lock:
+            msg_id = next(self.ids)
+            message = {'id': msg_id, 'method': method, 'params': params or {}}
+            if self.target_session:
+                message['sessionId'] = self.target_session
+            self.ws.send(json.dumps(message))
+            while True:
+                reply = json.loads(self.ws.recv())
+                if reply.get('id') == msg_id:
+                    break
+        if 'error' in reply:
+            raise WebDriverException(f"CDP {method} failed: {reply['error'].get('message')}")
+        return reply['result']
+    
+    def close(self):
+        try:
+            self.ws.close()
+        except Exception:
+            pass
+
+
+# JavaScript click at (arguments[0], arguments[1]) in viewport space.
+# Enhanced to handle video players, checkboxes, radio buttons, and label elements
+CLICK_SCRIPT = """
+    var x = arguments[0], y = arguments[1];
+    var element = document.elementFromPoint(x, y);
+    if (!element) {
+        return {success: false, error: 'No element found at ' + x + ',' + y};
+    }
+
+    console.log('Initial element at (' + x + ', ' + y + '):', element.tagName, element.className, element.type || '');
+
+    // Function to find clickable ancestor
+    function findClickable(el, maxDepth) {
+        for (var i = 0; i < maxDepth && el; i++) {
+            if (el.tagName === 'A' || el.tagName === 'BUTTON' || 
+                (el.tagName === 'INPUT' && (el.type === 'submit' || el.type === 'button' || el.type === 'checkbox' || el.type === 'radio')) ||
+                el.getAttribute('role') === 'button' ||
+                el.getAttribute('role') === 'checkbox' ||
+                el.getAttribute('role') === 'switch' ||
+                el.onclick || el.hasAttribute('onclick') ||
+                (el.className && typeof el.className === 'string' && 
+                 (el.className.indexOf('btn') !== -1 || el.className.indexOf('button') !== -1 ||
+                  el.className.indexOf('play') !== -1 || el.className.indexOf('ytp-') !== -1 ||
+                  el.className.indexOf('checkbox') !== -1 || el.className.indexOf('toggle') !== -1 ||
+                  el.className.indexOf('switch') !== -1))) {
+                return el;
+            }
+            el = el.parentElement;
+        }
+        return null;
+    }
+
+    // For SVG elements, path elements, or elements with pointer-events, find clickable parent
+    if (element.tagName === 'svg' || element.tagName === 'SVG' || 
+        element.tagName === 'path' || element.tagName === 'PATH' ||
+        element.tagName === 'use' || element.tagName === 'USE' ||
+        element.tagName === 'g' || element.tagName === 'G' ||
+        element.tagName === 'circle' || element.tagName === 'rect' ||
+        element.tagName === 'line' || element.tagName === 'polyline' ||
+        element.tagName === 'polygon') {
+        var clickable = findClickable(element, 10);
+        if (clickable) element = clickable;
+    }
+
+    // Handle custom checkbox/toggle elements (Reddit, etc.)
+    // Look for role="checkbox", role="switch", or checkbox-like class names
+    var isCustomCheckbox = element.getAttribute('role') === 'checkbox' || 
+        element.getAttribute('role') === 'switch' ||
+        (element.className && typeof element.className === 'string' && 
+         (element.className.indexOf('checkbox') !== -1 || 
+          element.className.indexOf('toggle') !== -1 ||
+          element.className.indexOf('switch') !== -1));
+
+    // Also check parent for checkbox role (sometimes the visual is inside)
+    if (!isCustomCheckbox && element.parentElement) {
+        var parent = element.parentElement;
+        isCustomCheckbox = parent.getAttribute('role') === 'checkbox' || 
+            parent.getAttribute('role') === 'switch' ||
+            (parent.className && typeof parent.className === 'string' && 
+             (parent.className.indexOf('checkbox') !== -1 || 
+              parent.className.indexOf('toggle') !== -1));
+        if (isCustomCheckbox) element = parent;
+    }
+
+    // Handle label elements - find and click the associated input
+    if (element.tagName === 'LABEL') {
+        var forId = element.getAttribute('for');
+        if (forId) {
+            var input = document.getElementById(forId);
+            if (input) element = input;
+        } else {
+            // Label might contain the input
+            var input = element.querySelector('input');
+            if (input) element = input;
+        }
+    }
+
+    // For checkboxes and radio buttons, toggle directly
+    if (element.tagName === 'INPUT' && (element.type === 'checkbox' || element.type === 'radio')) {
+        element.checked = !element.checked;
+        // Dispatch change event
+        var changeEvent = new Event('change', {bubbles: true});
+        element.dispatchEvent(changeEvent);
+        var inputEvent = new Event('input', {bubbles: true});
+        element.dispatchEvent(inputEvent);
+        return {
+            success: true,
+            element: element.tagName,
+            type: element.type,
+            checked: element.checked
+        };
+    }
+
+    // Handle custom checkbox with aria-checked attribute
+    if (isCustomCheckbox) {
+        var currentState = element.getAttribute('aria-checked');
+        if (currentState !== null) {
+            var newState = currentState === 'true' ? 'false' : 'true';
+            element.setAttribute('aria-checked', newState);
+        }
+        // Still dispatch click events for the component to handle
+    }
+
+    // Scroll element into view if needed
+    element.scrollIntoView({behavior: 'instant', block: 'nearest'});
+
+    // DON'T focus the element - it causes blue overlay on some sites like Instagram
+    // Only focus input fields
+    if (element.tagName === 'INPUT' || element.tagName === 'TEXTAREA' || element.isContentEditable) {
+        if (element.focus) {
+            element.focus();
+        }
+    }
+
+    // Special handling for consent/cookie buttons - look for common consent button patterns
+    var isConsentButton = false;
+    var consentKeywords = ['accept', 'agree', 'consent', 'allow', 'ok', 'got it', 'continue', 'i accept', 'i agree'];
+    var elementText = (element.textContent || '').toLowerCase().trim();
+    var elementId = (element.id || '').toLowerCase();
+    var elementClass = (typeof element.className === 'string' ? element.className : '').toLowerCase();
+
+    for (var i = 0; i < consentKeywords.length; i++) {
+        if (elementText.indexOf(consentKeywords[i]) !== -1 || 
+            elementId.indexOf(consentKeywords[i]) !== -1 ||
+            elementClass.indexOf(consentKeywords[i]) !== -1) {
+            isConsentButton = true;
+            break;
+        }
+    }
+
+    // If it's a consent button, try multiple click methods
+    if (isConsentButton) {
+        console.log('Detected consent button, using enhanced click');
+        // Try pointer events
+        var pointerDown = new PointerEvent('pointerdown', {
+            view: window, bubbles: true, cancelable: true, clientX: x, clientY: y, button: 0, isPrimary: true
+        });
+        var pointerUp = new PointerEvent('pointerup', {
+            view: window, bubbles: true, cancelable: true, clientX: x, clientY: y, button: 0, isPrimary: true
+        });
+        element.dispatchEvent(pointerDown);
+        element.dispatchEvent(pointerUp);
+    }
+
+    // Dispatch complete mouse event sequence for maximum compatibility
+    var mousedown = new MouseEvent('mousedown', {
+        view: window,
+        bubbles: true,
+        cancelable: true,
+        clientX: x,
+        clientY: y,
+        button: 0
+    });
+    var mouseup = new MouseEvent('mouseup', {
+        view: window,
+        bubbles: true,
+        cancelable: true,
+        clientX: x,
+        clientY: y,
+        button: 0
+    });
+    var click = new MouseEvent('click', {
+        view: window,
+        bubbles: true,
+        cancelable: true,
+        clientX: x,
+        clientY: y,
+        button: 0
+    });
+
+    element.dispatchEvent(mousedown);
+    element.dispatchEvent(mouseup);
+    element.dispatchEvent(click);
+
+    // Also call native click() for links and buttons
+    if (element.click) element.click();
+
+    // For consent buttons, also try clicking any visible accept buttons in the DOM
+    if (isConsentButton || element.tagName === 'DIV' || element.tagName === 'SPAN') {
+        // Try to find and click common consent buttons
+        var selectors = [
+            '#onetrust-accept-btn-handler',
+            '.onetrust-accept-btn-handler',
+            '[id*="accept"]',
+            '[class*="accept"]',
+            'button[title*="Accept"]',
+            'button[aria-label*="Accept"]',
+            '.consent-accept',
+            '.cookie-accept',
+            '#accept-cookies',
+            '.accept-button',
+            '[data-testid*="accept"]'
+        ];
+        for (var s = 0; s < selectors.length; s++) {
+            try {
+                var btn = document.querySelector(selectors[s]);
+                if (btn && btn.offsetParent !== null) {
+                    btn.click();
+                    console.log('Clicked consent button via selector: ' + selectors[s]);
+                    break;
+                }
+            } catch(e) {}
+        }
+    }
+
+    return {
+        success: true,
+        element: element.tagName,
+        id: element.id || '',
+        class: element.className || '',
+        href: element.href || '',
+        text: element.textContent ? element.textContent.substring(0, 50) : ''
+    };
+"""
+
+# JavaScript scroll by (arguments[0], arguments[1]) - works with custom scroll
+# containers (Instagram, Facebook, etc.)
+SCROLL_SCRIPT = """
+    var deltaX = arguments[0];
+    var deltaY = arguments[1];
+
+    // Function to find the scrollable element
+    function findScrollable() {
+        // Common scroll container selectors for various sites
+        var selectors = [
+            'main[role="main"]',           // Instagram, Twitter
+            '[role="feed"]',               // Facebook feed
+            'article',                     // General articles
+            '.scroll-container',
+            '[data-pagelet="FeedUnit_0"]', // Facebook
+            'section main',                // Instagram
+            '[style*="overflow"]',         // Elements with overflow set
+            'body',
+            'html'
+        ];
+
+        // First check if there's an element under the center of the viewport that's scrollable
+        var centerX = window.innerWidth / 2;
+        var centerY = window.innerHeight / 2;
+        var el = document.elementFromPoint(centerX, centerY);
+
+        // Walk up the DOM to find a scrollable parent
+        while (el && el !== document.body && el !== document.documentElement) {
+            var style = window.getComputedStyle(el);
+            var overflowY = style.overflowY;
+            var overflowX = style.overflowX;
+
+            if ((overflowY === 'auto' || overflowY === 'scroll' || overflowY === 'overlay') && el.scrollHeight > el.clientHeight) {
+                return el;
+            }
+            if ((overflowX === 'auto' || overflowX === 'scroll' || overflowX === 'overlay') && el.scrollWidth > el.clientWidth) {
+                return el;
+            }
+            el = el.parentElement;
+        }
+
+        // Try specific selectors
+        for (var i = 0; i < selectors.length; i++) {
+            var elements = document.querySelectorAll(selectors[i]);
+            for (var j = 0; j < elements.length; j++) {
+                var elem = elements[j];
+                if (elem.scrollHeight > elem.clientHeight || elem.scrollWidth > elem.clientWidth) {
+                    return elem;
+                }
+            }
+        }
+
+        return null;
+    }
+
+    var scrollTarget = findScrollable();
+    var scrolled = false;
+
+    if (scrollTarget && scrollTarget !== document.body && scrollTarget !== document.documentElement) {
+        // Scroll the specific container
+        var beforeY = scrollTarget.scrollTop;
+        var beforeX = scrollTarget.scrollLeft;
+        scrollTarget.scrollBy(deltaX, deltaY);
+        scrolled = (scrollTarget.scrollTop !== beforeY || scrollTarget.scrollLeft !== beforeX);
+        console.log('Scrolled element:', scrollTarget.tagName, scrollTarget.className, 'by', deltaY);
+    }
+
+    // Also try window scroll as fallback or in addition
+    if (!scrolled) {
+        var beforeWinY = window.scrollY || window.pageYOffset;
+        var beforeWinX = window.scrollX || window.pageXOffset;
+        window.scrollBy(deltaX, deltaY);
+        scrolled = (window.scrollY !== beforeWinY || window.scrollX !== beforeWinX);
+        console.log('Scrolled window by', deltaY);
+    }
+
+    // Also dispatch wheel event for sites that listen for it
+    var wheelEvent = new WheelEvent('wheel', {
+        deltaX: deltaX,
+        deltaY: deltaY,
+        deltaMode: 0,
+        bubbles: true,
+        cancelable: true
+    });
+    (scrollTarget || document.body).dispatchEvent(wheelEvent);
+
+    return scrolled;
+"""
+
+# Replays a batch of queued click/scroll events (arguments[0]) in one round-trip
+INPUT_BATCH_SCRIPT = (
+    "var click = function() {" + CLICK_SCRIPT + "};\n"
+    "var scroll = function() {" + SCROLL_SCRIPT + "};\n"
+    """
+    var events = arguments[0];
+    var results = [];
+    for (var i = 0; i < events.length; i++) {
+        var ev = events[i];
+        if (ev.type === 'click') {
+            results.push(click(ev.x, ev.y));
+        } else if (ev.type === 'scroll') {
+            results.push(scroll(ev.deltaX, ev.deltaY));
+        }
+    }
+    return results;
+    """
+)
+
+# Focuses the active input, or the first visible one if nothing is focused
+FOCUS_INPUT_SCRIPT = """
+    var activeElement = document.activeElement;
+    var isInputFocused = activeElement && 
+        (activeElement.tagName === 'INPUT' || 
+         activeElement.tagName === 'TEXTAREA' || 
+         activeElement.isContentEditable);
+
+    if (!isInputFocused) {
+        // Try to find and focus a visible input field
+        var inputs = document.querySelectorAll('input[type="text"], input[type="search"], input:not([type]), textarea, [contenteditable="true"]');
+        for (var i = 0; i < inputs.length; i++) {
+            var input = inputs[i];
+            if (input.offsetParent !== null) { // Check if visible
+                input.focus();
+                input.scrollIntoView({behavior: 'instant', block: 'center'});
+                return {focused: true, element: input.tagName, id: input.id || '', type: input.type || ''};
+            }
+        }
+        return {focused: false, error: 'No input element found'};
+    }
+    return {focused: true, element: activeElement.tagName, id: activeElement.id || '', type: activeElement.type || ''};
+"""
+
+# Installed on every new document: counts DOM mutations, scrolls and resizes so
+# background captures can tell whether anything visible may have changed
+DIRTY_TRACKER_SCRIPT = """
+    window.__jiomosaDirty = 0;
+    var markDirty = function() { window.__jiomosaDirty++; };
+    new MutationObserver(markDirty).observe(document, {
+        subtree: true, childList: true, attributes: true, characterData: true
+    });
+    window.addEventListener('scroll', markDirty, true);
+    window.addEventListener('resize', markDirty);
+    // Pixel changes without DOM mutations: typed text, .checked toggles, focus/caret
+    // moves, and (capture phase, since they don't bubble) images finishing loading
+    ['input', 'change', 'keydown', 'focusin', 'load'].forEach(function(type) {
+        window.addEventListener(type, markDirty, true);
+    });
+"""
+
+# Returns the dirty counter, or -1 when the page may change without DOM mutations
+# (running animations, playing media, canvases, iframes) or isn't tracked
+DIRTY_PROBE_SCRIPT = """(function() {
+    if (window.__jiomosaDirty === undefined) return -1;
+    if (document.querySelector('canvas, iframe')) return -1;
+    var media = document.querySelectorAll('video, audio');
+    for (var i = 0; i < media.length; i++) {
+        if (!media[i].paused) return -1;
+    }
+    if (document.getAnimations && document.getAnimations().some(function(a) {
+        return a.playState === 'running';
+    })) return -1;
+    return window.__jiomosaDirty;
+})()"""
+
+# Special key names accepted by send_key
+SPECIAL_KEYS = {
+    'Enter': Keys.ENTER,
+    'Backspace': Keys.BACKSPACE,
+    'Tab': Keys.TAB,
+    'Escape': Keys.ESCAPE,
+    'Delete': Keys.DELETE,
+    'ArrowUp': Keys.ARROW_UP,
+    'ArrowDown': Keys.ARROW_DOWN,
+    'ArrowLeft': Keys.ARROW_LEFT,
+    'ArrowRight': Keys.ARROW_RIGHT,
+    'Home': Keys.HOME,
+    'End': Keys.END,
+    'PageUp': Keys.PAGE_UP,
+    'PageDown': Keys.PAGE_DOWN,
+    'Space': Keys.SPACE,
+}
+
+
+# Runs per-session post-init WebDriver setters off the request thread
+_setup_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='session-setup')
+
+# Runs session.close() (driver.quit() is a slow Grid round trip) for expired or async-closed sessions
+_close_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='session-close')
+
+# CPU-bound image work runs on native threads so it doesn't stall the gevent
+# hub (and with it every Socket.IO handler). Pillow and libjpeg-turbo release
+# the GIL while coding, so encodes also spread across cores.
+if ASYNC_MODE == 'gevent':
+    from gevent import get_hub
+    
+    def run_blocking(fn, *args):
+        """Run fn on gevent's native thread pool, yielding the calling greenlet"""
+        return get_hub().threadpool.apply(fn, args)
+else:
+    def run_blocking(fn, *args):
+        """Without gevent, request threads are real threads already"""
+        return fn(*args)
+
+
+def resize_to_jpeg(screenshot, width, height, quality, output, source_quality=None):
+    """Resize a screenshot and JPEG-encode it into output; touches no shared state
+    
+    A JPEG that is already width x height at source_quality == quality is
+    returned unchanged: Image.open only reads the header, so nothing is decoded.
+    """
+    img = Image.open(BytesIO(screenshot))
+    if img.format == 'JPEG' and img.size == (width, height) and source_quality == quality:
+        return screenshot
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    # Use high-quality resizing to maintain readability
+    img = img.resize((width, height), Image.Resampling.LANCZOS)
+    output.seek(0)
+    output.truncate()
+    img.save(output, format='JPEG', quality=quality)
+    return output.getvalue()
+
+
+def scale_jpeg(frame, width, height, quality):
+    """Shrink a JPEG frame to fit within width x height, keeping its aspect ratio"""
+    img = Image.open(BytesIO(frame))
+    # Bilinear is plenty for a further downscale of an already resized frame
+    img.thumbnail((width, height), Image.Resampling.BILINEAR)
+    output = BytesIO()
+    img.save(output, format='JPEG', quality=quality)
+    return output.getvalue()
+
+
+def resize_to_webp_lossless(screenshot, width, height):
+    """Resize a screenshot and encode it as lossless WebP with Pillow's fastest method"""
+    img = Image.open(BytesIO(screenshot))
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    img = img.resize((width, height), Image.Resampling.LANCZOS)
+    output = BytesIO()
+    img.save(output, format='WEBP', lossless=True, method=0, quality=100)
+    return output.getvalue()
+
+
+# First frame captured after loading a URL, shared across sessions: url -> (frame, quality, captured_at).
+# Every session renders the same viewport, so a new session opening a popular
+# page can show another session's recent frame until its own capture lands.
+_url_frame_cache = OrderedDict()
+_url_frame_lock = threading.Lock()
+
+
+def cached_url_frame(url):
+    """Return a (frame, quality) captured for url within URL_FRAME_CACHE_TTL, or None"""
+    with _url_frame_lock:
+        entry = _url_frame_cache.get(url)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[2] > URL_FRAME_CACHE_TTL:
+            del _url_frame_cache[url]
+            return None
+        _url_frame_cache.move_to_end(url)
+        return entry[0], entry[1]
+
+
+def store_url_frame(url, frame, quality):
+    """Remember the frame a session captured right after loading url (LRU-bounded)"""
+    with _url_frame_lock:
+        _url_frame_cache[url] = (frame, quality, time.monotonic())
+        _url_frame_cache.move_to_end(url)
+        while len(_url_frame_cache) > URL_FRAME_CACHE_SIZE:
+            _url_frame_cache.popitem(last=False)
+
+
+# Background frame captures for all sessions, fed by run_capture_scheduler()
+_capture_executor = ThreadPoolExecutor(max_workers=CAPTURE_WORKERS, thread_name_prefix='frame-capture')
 
 
 class BrowserSession:
@@ -110,84 +883,151 @@ class BrowserSession:
         self.last_activity = time.time()
         self.last_frame = None
         self.frame_capture_active = False
+        self.capture_interval = FRAME_CAPTURE_INTERVAL
+        self.capture_next_due = 0.0
+        self.capture_future = None
         self.frame_lock = threading.Lock()
+        self.frame_ready = threading.Condition(self.frame_lock)  # Notified whenever last_frame changes
+        self.setup_future = None
+        self.input_queue = deque()
+        self.input_lock = threading.Lock()
+        self.input_flush_lock = threading.Lock()
+        self.input_timer = None
+        self.page_info = None
+        self.page_info_ts = 0.0
+        self.current_url = None  # Last URL seen (loaded or read from the page); no RPC to read it
+        self.actions = None
+        self.actions_lock = threading.Lock()
+        self.encode_buffer = BytesIO()
+        self.encode_lock = threading.Lock()
+        self.cdp = None
+        self.jpeg_quality = FRAME_JPEG_QUALITY
+        self.capture_quality = None  # Quality all WebSocket subscribers share; overrides jpeg_quality
+        self.frame_quality = None  # JPEG quality last_frame was encoded at
+        self.frame_etag = None
+        self.frame_state = (None, None)  # (last_frame, frame_etag), swapped as one reference
+        self.frame_b64 = None  # base64 of last_frame for /frame/data, built on first request
+        self.screenshot_hash = None  # Digest of the raw screenshot last_frame was made from
+        self.scaled_frames = {}  # (width, height, etag) -> smaller JPEG for ?w=&h= requests
+        self.dirty_seen = -1  # Page change counter at the last background capture
+        self.loaded_url = None  # URL whose first frame goes to _url_frame_cache; cleared by input
+        self.pristine = True  # No input or earlier navigation yet, so frames carry no per-user state
+        self.last_capture_time = 0.0
+        self.lossless_frame = None  # ((screenshot digest, width, height), WebP bytes) of the last lossless capture
+        self.scheduled_expiry = None  # Deadline of this session's live expiration_heap entry
+        self.closed = False
         
     def initialize(self):
         """Initialize the Selenium WebDriver"""
         try:
-            chrome_options = Options()
-            chrome_options.add_argument('--no-sandbox')
-            chrome_options.add_argument('--disable-dev-shm-usage')
-            chrome_options.add_argument('--disable-gpu')
-            
-            # Use mobile viewport size (320x480) - standard mobile size Chrome can render
-            # Content will be scaled down to 240x320 for KaiOS display
-            chrome_options.add_argument('--window-size=320,480')
-            chrome_options.add_argument('--window-position=0,0')
-            
-            # Force light mode for better readability on small screens
-            chrome_options.add_argument('--force-color-profile=srgb')
-            chrome_options.add_argument('--disable-features=WebContentsForceDark')
-            
-            # Force videos to play inline, not download or open externally
-            chrome_options.add_argument('--autoplay-policy=no-user-gesture-required')
-            chrome_options.add_argument('--disable-features=PreloadMediaEngagementData,MediaEngagementBypassAutoplayPolicies')
-            
-            # Kiosk mode: hide browser UI elements for clean web content view
-            chrome_options.add_argument('--kiosk')
-            chrome_options.add_argument('--start-maximized')
-            chrome_options.add_argument('--disable-infobars')
-            chrome_options.add_argument('--disable-extensions')
-            
-            # KaiOS-like mobile user agent to load mobile versions of websites
-            mobile_user_agent = 'Mozilla/5.0 (Mobile; rv:48.0) Gecko/48.0 Firefox/48.0 KAIOS/2.5'
-            chrome_options.add_argument(f'--user-agent={mobile_user_agent}')
-            
-            # Mobile emulation for proper responsive rendering
-            # Using 320x480 which is a standard mobile size Chrome properly supports
-            mobile_emulation = {
-                'deviceMetrics': {'width': 320, 'height': 480, 'pixelRatio': 1.0},
-                'userAgent': mobile_user_agent
-            }
-            chrome_options.add_experimental_option('mobileEmulation', mobile_emulation)
-            
-            # Set preference to prefer light color scheme
-            prefs = {
-                'profile.default_content_setting_values.color_scheme': 1,  # 1 = light
-            }
-            chrome_options.add_experimental_option('prefs', prefs)
-            
-            # Hide browser chrome (address bar, tabs, etc.)
-            chrome_options.add_experimental_option('excludeSwitches', ['enable-automation'])
-            chrome_options.add_experimental_option('useAutomationExtension', False)
-            
             # Connect to remote Selenium Grid
             selenium_url = f'http://{SELENIUM_HOST}:{SELENIUM_PORT}/wd/hub'
-            logger.info(f"Connecting to Selenium at {selenium_url}")
+            logger.info("Connecting to Selenium at %s", selenium_url)
             
+            # Explicit Chrome connection: keeps connections alive between commands
+            # and registers the executeCdpCommand endpoint used by execute_cdp()
             self.driver = webdriver.Remote(
-                command_executor=selenium_url,
-                options=chrome_options
+                command_executor=PooledChromeConnection(selenium_url),
+                options=_CHROME_OPTIONS,
+                keep_alive=True
             )
+            self.actions = ActionChains(self.driver)
             
-            # Chrome has a minimum window size (~500px), so we set a reasonable size
-            # and rely on mobile emulation to render content at mobile dimensions
-            self.driver.set_window_size(320, 480)
+            # Post-init setters don't need to block session creation; they run in
+            # the background and load_url() waits for them before navigating
+            self.setup_future = _setup_executor.submit(self._apply_viewport_settings)
             
-            logger.info(f"Browser session {self.session_id} initialized with mobile emulation")
+            logger.info("Browser session %s initialized with mobile emulation", self.session_id)
             return True
         except Exception as e:
-            logger.error(f"Failed to initialize browser session: {e}")
+            logger.error("Failed to initialize browser session: %s", e)
             return False
     
+    def execute_cdp(self, cmd, params):
+        """Run a Chrome DevTools Protocol command through the remote driver"""
+        return self.driver.execute('executeCdpCommand', {'cmd': cmd, 'params': params})['value']
+    
+    def _apply_viewport_settings(self):
+        """Apply window size and device metrics once the driver is up"""
+        try:
+            # Chrome has a minimum window size (~500px), so we set a reasonable size
+            # and rely on mobile emulation to render content at mobile dimensions
+            self.driver.set_window_size(320, 480)
+            self.execute_cdp('Emulation.setDeviceMetricsOverride', {
+                'width': 320, 'height': 480, 'deviceScaleFactor': 1, 'mobile': True
+            })
+        except Exception as e:
+            logger.warning("Could not apply viewport settings for session %s: %s", self.session_id, e)
+        
+        if CAPTURE_SKIP_IDLE:
+            try:
+                self.execute_cdp('Page.addScriptToEvaluateOnNewDocument', {'source': DIRTY_TRACKER_SCRIPT})
+            except Exception as e:
+                logger.warning("Could not install change tracking for session %s: %s", self.session_id, e)
+        
+        if CDP_DIRECT and WEBSOCKET_CLIENT_AVAILABLE:
+            self._connect_cdp()
+    
+    def _connect_cdp(self):
+        """Open the direct DevTools WebSocket used for screenshots"""
+        try:
+            cdp_url = self.driver.capabilities.get('se:cdp')
+            if not cdp_url:
+                return
+            # The Grid may advertise its container address; reach it the same way as WebDriver
+            cdp_url = urlsplit(cdp_url)._replace(netloc=f'{SELENIUM_HOST}:{SELENIUM_PORT}').geturl()
+            # Chrome window handles are DevTools target IDs
+            self.cdp = CDPConnection(cdp_url, self.driver.current_window_handle)
+            logger.info("Direct CDP connection open for session %s", self.session_id)
+        except Exception as e:
+            logger.warning("Direct CDP unavailable for session %s, using WebDriver: %s", self.session_id, e)
+    
+    def capture_screenshot_cdp(self, params):
+        """Run Page.captureScreenshot, preferring the direct DevTools socket"""
+        cdp = self.cdp
+        if cdp is not None:
+            try:
+                return cdp.send('Page.captureScreenshot', params)
+            except Exception as e:
+                logger.warning("Direct CDP failed for session %s, using WebDriver: %s", self.session_id, e)
+                self.cdp = None
+                cdp.close()
+        return self.execute_cdp('Page.captureScreenshot', params)
+    
+    def probe_dirty(self):
+        """Read the page's change counter (-1 = unknown, capture anyway)"""
+        try:
+            cdp = self.cdp
+            if cdp is not None:
+                result = cdp.send('Runtime.evaluate', {
+                    'expression': DIRTY_PROBE_SCRIPT, 'returnByValue': True
+                })
+                return result['result'].get('value', -1)
+            return self.driver.execute_script('return ' + DIRTY_PROBE_SCRIPT)
+        except Exception as e:
+            logger.debug("Change probe failed for session %s: %s", self.session_id, e)
+            return -1
+    
+    def wait_until_ready(self, timeout=10):
+        """Block until the background post-init setup has finished"""
+        future = self.setup_future
+        if future is None:
+            return
+        try:
+            future.result(timeout=timeout)
+        except Exception as e:
+            logger.warning("Post-init setup for session %s did not finish: %s", self.session_id, e)
+        self.setup_future = None
+    
     def load_url(self, url, wait_for_load=True, timeout=30):
         """Load a URL in the browser"""
         try:
             if not self.driver:
                 if not self.initialize():
                     return False, "Failed to initialize browser"
+            self.wait_until_ready()
             
-            logger.info(f"Loading URL: {url}")
+            logger.info("Loading URL: %s", url)
             
             # For YouTube, use the light theme parameter
             if 'youtube.com' in url and '?' in url:
@@ -199,7 +1039,7 @@ class BrowserSession:
             if 'web.whatsapp.com' in url:
                 # Temporarily change user agent to desktop for WhatsApp Web
                 desktop_user_agent = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-                self.driver.execute_cdp_cmd('Network.setUserAgentOverride', {'userAgent': desktop_user_agent})
+                self.execute_cdp('Network.setUserAgentOverride', {'userAgent': desktop_user_agent})
                 logger.info("Set desktop user agent for WhatsApp Web")
             
             self.driver.get(url)
@@ -593,278 +1433,99 @@ class BrowserSession:
                     }
                 """)
             except Exception as e:
-                logger.warning(f"Could not inject light mode CSS: {e}")
+                logger.warning("Could not inject light mode CSS: %s", e)
             
             self.last_activity = time.time()
-            logger.info(f"Successfully loaded: {url}")
+            self.page_info = None  # Title/URL changed
+            self.current_url = url
+            if URL_FRAME_CACHE_TTL > 0:
+                # Key on where the browser ended up, so redirects (e.g. to a login page) don't alias
+                final_url = self.driver.current_url
+                cached = cached_url_frame(final_url)
+                if cached is not None:
+                    # Show another session's fresh frame of this page until our own capture
+                    with self.frame_lock:
+                        self._install_frame(*cached)
+                        self.screenshot_hash = None
+                elif self.pristine:
+                    # Only a session's first page, before any input, is safe to share
+                    self.loaded_url = final_url
+            self.pristine = False
+            logger.info("Successfully loaded: %s", url)
             return True, "Page loaded successfully"
             
         except TimeoutException:
-            logger.warning(f"Timeout loading URL: {url}")
+            logger.warning("Timeout loading URL: %s", url)
             return True, "Page loaded with timeout (may be partially loaded)"
         except WebDriverException as e:
-            logger.error(f"WebDriver error loading URL: {e}")
+            logger.error("WebDriver error loading URL: %s", e)
             return False, f"WebDriver error: {str(e)}"
         except Exception as e:
-            logger.error(f"Unexpected error loading URL: {e}")
+            logger.error("Unexpected error loading URL: %s", e)
             return False, f"Error: {str(e)}"
     
-    def get_page_info(self):
-        """Get information about the current page"""
+    def get_page_info(self, max_age=PAGE_INFO_CACHE_TTL):
+        """Get information about the current page (cached for up to max_age seconds)"""
         try:
             if not self.driver:
                 return None
             
-            return {
-                'title': self.driver.title,
-                'url': self.driver.current_url,
+            if self.page_info is not None and time.time() - self.page_info_ts < max_age:
+                return self.page_info
+            
+            # One script call instead of separate title/current_url/window-size commands
+            title, url, width, height = self.driver.execute_script(
+                "return [document.title, location.href, window.outerWidth, window.outerHeight];"
+            )
+            self.current_url = url
+            self.page_info = {
+                'title': title,
+                'url': url,
                 'session_id': self.session_id,
-                'window_size': self.driver.get_window_size()
+                'window_size': {'width': width, 'height': height}
             }
+            self.page_info_ts = time.time()
+            return self.page_info
         except Exception as e:
-            logger.error(f"Error getting page info: {e}")
+            logger.error("Error getting page info: %s", e)
             return None
     
+    def _mark_interacted(self):
+        """Input makes later frames this session's own: never publish them to the URL frame cache"""
+        self.loaded_url = None
+        self.pristine = False
+        self.dirty_seen = -1  # Input can change pixels the dirty tracker doesn't see; capture next time
+    
     def send_click(self, x, y):
         """Send click event at specified coordinates - improved for navigation"""
         try:
             if not self.driver:
                 return False, "Driver not initialized"
             
-            # Get current viewport dimensions for debugging
-            viewport_size = self.driver.execute_script("return {width: window.innerWidth, height: window.innerHeight};")
-            logger.info(f"Click at ({x}, {y}), viewport: {viewport_size}")
+            # Viewport dimensions are only fetched for debugging; it costs an extra round trip
+            if logger.isEnabledFor(logging.DEBUG):
+                viewport_size = self.driver.execute_script("return {width: window.innerWidth, height: window.innerHeight};")
+                logger.debug("Click at (%s, %s), viewport: %s", x, y, viewport_size)
             
             # Use JavaScript-based click for better reliability and navigation support
-            # Enhanced to handle video players, checkboxes, radio buttons, and label elements
-            script = f"""
-                var x = {x}, y = {y};
-                var element = document.elementFromPoint(x, y);
-                if (!element) {{
-                    return {{success: false, error: 'No element found at ' + x + ',' + y}};
-                }}
-                
-                console.log('Initial element at (' + x + ', ' + y + '):', element.tagName, element.className, element.type || '');
-                
-                // Function to find clickable ancestor
-                function findClickable(el, maxDepth) {{
-                    for (var i = 0; i < maxDepth && el; i++) {{
-                        if (el.tagName === 'A' || el.tagName === 'BUTTON' || 
-                            (el.tagName === 'INPUT' && (el.type === 'submit' || el.type === 'button' || el.type === 'checkbox' || el.type === 'radio')) ||
-                            el.getAttribute('role') === 'button' ||
-                            el.getAttribute('role') === 'checkbox' ||
-                            el.getAttribute('role') === 'switch' ||
-                            el.onclick || el.hasAttribute('onclick') ||
-                            (el.className && typeof el.className === 'string' && 
-                             (el.className.indexOf('btn') !== -1 || el.className.indexOf('button') !== -1 ||
-                              el.className.indexOf('play') !== -1 || el.className.indexOf('ytp-') !== -1 ||
-                              el.className.indexOf('checkbox') !== -1 || el.className.indexOf('toggle') !== -1 ||
-                              el.className.indexOf('switch') !== -1))) {{
-                            return el;
-                        }}
-                        el = el.parentElement;
-                    }}
-                    return null;
-                }}
-                
-                // For SVG elements, path elements, or elements with pointer-events, find clickable parent
-                if (element.tagName === 'svg' || element.tagName === 'SVG' || 
-                    element.tagName === 'path' || element.tagName === 'PATH' ||
-                    element.tagName === 'use' || element.tagName === 'USE' ||
-                    element.tagName === 'g' || element.tagName === 'G' ||
-                    element.tagName === 'circle' || element.tagName === 'rect' ||
-                    element.tagName === 'line' || element.tagName === 'polyline' ||
-                    element.tagName === 'polygon') {{
-                    var clickable = findClickable(element, 10);
-                    if (clickable) element = clickable;
-                }}
-                
-                // Handle custom checkbox/toggle elements (Reddit, etc.)
-                // Look for role="checkbox", role="switch", or checkbox-like class names
-                var isCustomCheckbox = element.getAttribute('role') === 'checkbox' || 
-                    element.getAttribute('role') === 'switch' ||
-                    (element.className && typeof element.className === 'string' && 
-                     (element.className.indexOf('checkbox') !== -1 || 
-                      element.className.indexOf('toggle') !== -1 ||
-                      element.className.indexOf('switch') !== -1));
-                
-                // Also check parent for checkbox role (sometimes the visual is inside)
-                if (!isCustomCheckbox && element.parentElement) {{
-                    var parent = element.parentElement;
-                    isCustomCheckbox = parent.getAttribute('role') === 'checkbox' || 
-                        parent.getAttribute('role') === 'switch' ||
-                        (parent.className && typeof parent.className === 'string' && 
-                         (parent.className.indexOf('checkbox') !== -1 || 
-                          parent.className.indexOf('toggle') !== -1));
-                    if (isCustomCheckbox) element = parent;
-                }}
-                
-                // Handle label elements - find and click the associated input
-                if (element.tagName === 'LABEL') {{
-                    var forId = element.getAttribute('for');
-                    if (forId) {{
-                        var input = document.getElementById(forId);
-                        if (input) element = input;
-                    }} else {{
-                        // Label might contain the input
-                        var input = element.querySelector('input');
-                        if (input) element = input;
-                    }}
-                }}
-                
-                // For checkboxes and radio buttons, toggle directly
-                if (element.tagName === 'INPUT' && (element.type === 'checkbox' || element.type === 'radio')) {{
-                    element.checked = !element.checked;
-                    // Dispatch change event
-                    var changeEvent = new Event('change', {{bubbles: true}});
-                    element.dispatchEvent(changeEvent);
-                    var inputEvent = new Event('input', {{bubbles: true}});
-                    element.dispatchEvent(inputEvent);
-                    return {{
-                        success: true,
-                        element: element.tagName,
-                        type: element.type,
-                        checked: element.checked
-                    }};
-                }}
-                
-                // Handle custom checkbox with aria-checked attribute
-                if (isCustomCheckbox) {{
-                    var currentState = element.getAttribute('aria-checked');
-                    if (currentState !== null) {{
-                        var newState = currentState === 'true' ? 'false' : 'true';
-                        element.setAttribute('aria-checked', newState);
-                    }}
-                    // Still dispatch click events for the component to handle
-                }}
-                
-                // Scroll element into view if needed
-                element.scrollIntoView({{behavior: 'instant', block: 'nearest'}});
-                
-                // DON'T focus the element - it causes blue overlay on some sites like Instagram
-                // Only focus input fields
-                if (element.tagName === 'INPUT' || element.tagName === 'TEXTAREA' || element.isContentEditable) {{
-                    if (element.focus) {{
-                        element.focus();
-                    }}
-                }}
-                
-                // Special handling for consent/cookie buttons - look for common consent button patterns
-                var isConsentButton = false;
-                var consentKeywords = ['accept', 'agree', 'consent', 'allow', 'ok', 'got it', 'continue', 'i accept', 'i agree'];
-                var elementText = (element.textContent || '').toLowerCase().trim();
-                var elementId = (element.id || '').toLowerCase();
-                var elementClass = (typeof element.className === 'string' ? element.className : '').toLowerCase();
-                
-                for (var i = 0; i < consentKeywords.length; i++) {{
-                    if (elementText.indexOf(consentKeywords[i]) !== -1 || 
-                        elementId.indexOf(consentKeywords[i]) !== -1 ||
-                        elementClass.indexOf(consentKeywords[i]) !== -1) {{
-                        isConsentButton = true;
-                        break;
-                    }}
-                }}
-                
-                // If it's a consent button, try multiple click methods
-                if (isConsentButton) {{
-                    console.log('Detected consent button, using enhanced click');
-                    // Try pointer events
-                    var pointerDown = new PointerEvent('pointerdown', {{
-                        view: window, bubbles: true, cancelable: true, clientX: x, clientY: y, button: 0, isPrimary: true
-                    }});
-                    var pointerUp = new PointerEvent('pointerup', {{
-                        view: window, bubbles: true, cancelable: true, clientX: x, clientY: y, button: 0, isPrimary: true
-                    }});
-                    element.dispatchEvent(pointerDown);
-                    element.dispatchEvent(pointerUp);
-                }}
-                
-                // Dispatch complete mouse event sequence for maximum compatibility
-                var mousedown = new MouseEvent('mousedown', {{
-                    view: window,
-                    bubbles: true,
-                    cancelable: true,
-                    clientX: x,
-                    clientY: y,
-                    button: 0
-                }});
-                var mouseup = new MouseEvent('mouseup', {{
-                    view: window,
-                    bubbles: true,
-                    cancelable: true,
-                    clientX: x,
-                    clientY: y,
-                    button: 0
-                }});
-                var click = new MouseEvent('click', {{
-                    view: window,
-                    bubbles: true,
-                    cancelable: true,
-                    clientX: x,
-                    clientY: y,
-                    button: 0
-                }});
-                
-                element.dispatchEvent(mousedown);
-                element.dispatchEvent(mouseup);
-                element.dispatchEvent(click);
-                
-                // Also call native click() for links and buttons
-                if (element.click) element.click();
-                
-                // For consent buttons, also try clicking any visible accept buttons in the DOM
-                if (isConsentButton || element.tagName === 'DIV' || element.tagName === 'SPAN') {{
-                    // Try to find and click common consent buttons
-                    var selectors = [
-                        '#onetrust-accept-btn-handler',
-                        '.onetrust-accept-btn-handler',
-                        '[id*="accept"]',
-                        '[class*="accept"]',
-                        'button[title*="Accept"]',
-                        'button[aria-label*="Accept"]',
-                        '.consent-accept',
-                        '.cookie-accept',
-                        '#accept-cookies',
-                        '.accept-button',
-                        '[data-testid*="accept"]'
-                    ];
-                    for (var s = 0; s < selectors.length; s++) {{
-                        try {{
-                            var btn = document.querySelector(selectors[s]);
-                            if (btn && btn.offsetParent !== null) {{
-                                btn.click();
-                                console.log('Clicked consent button via selector: ' + selectors[s]);
-                                break;
-                            }}
-                        }} catch(e) {{}}
-                    }}
-                }}
-                
-                return {{
-                    success: true,
-                    element: element.tagName,
-                    id: element.id || '',
-                    class: element.className || '',
-                    href: element.href || '',
-                    text: element.textContent ? element.textContent.substring(0, 50) : ''
-                }};
-            """
-            
-            result = self.driver.execute_script(script)
+            self._mark_interacted()
+            result = self.driver.execute_script(CLICK_SCRIPT, x, y)
             self.last_activity = time.time()
+            self.page_info = None  # The click may have navigated
             
             if isinstance(result, dict) and result.get('success'):
-                logger.info(f"Click sent at ({x}, {y}) - element: {result.get('element')} {result.get('class', '')} {result.get('text', '')[:30]}")
+                if logger.isEnabledFor(logging.INFO):
+                    logger.info("Click sent at (%s, %s) - element: %s %s %s", x, y, result.get('element'), result.get('class', ''), result.get('text', '')[:30])
                 # Give page time to process the click and start navigation if needed
                 time.sleep(0.1)
                 # Return element info for client to know what was clicked
                 return True, result
             else:
-                logger.warning(f"Click at ({x}, {y}) - {result}")
+                logger.warning("Click at (%s, %s) - %s", x, y, result)
                 return True, {'success': True, 'element': 'UNKNOWN'}
             
         except Exception as e:
-            logger.error(f"Error sending click: {e}")
+            logger.error("Error sending click: %s", e)
             return False, {'error': str(e)}
     
     def send_scroll(self, delta_x, delta_y):
@@ -873,100 +1534,14 @@ class BrowserSession:
             if not self.driver:
                 return False, "Driver not initialized"
             
-            # Enhanced scroll script that works with custom scroll containers (Instagram, Facebook, etc.)
-            script = f"""
-                var deltaX = {delta_x};
-                var deltaY = {delta_y};
-                
-                // Function to find the scrollable element
-                function findScrollable() {{
-                    // Common scroll container selectors for various sites
-                    var selectors = [
-                        'main[role="main"]',           // Instagram, Twitter
-                        '[role="feed"]',               // Facebook feed
-                        'article',                     // General articles
-                        '.scroll-container',
-                        '[data-pagelet="FeedUnit_0"]', // Facebook
-                        'section main',                // Instagram
-                        '[style*="overflow"]',         // Elements with overflow set
-                        'body',
-                        'html'
-                    ];
-                    
-                    // First check if there's an element under the center of the viewport that's scrollable
-                    var centerX = window.innerWidth / 2;
-                    var centerY = window.innerHeight / 2;
-                    var el = document.elementFromPoint(centerX, centerY);
-                    
-                    // Walk up the DOM to find a scrollable parent
-                    while (el && el !== document.body && el !== document.documentElement) {{
-                        var style = window.getComputedStyle(el);
-                        var overflowY = style.overflowY;
-                        var overflowX = style.overflowX;
-                        
-                        if ((overflowY === 'auto' || overflowY === 'scroll' || overflowY === 'overlay') && el.scrollHeight > el.clientHeight) {{
-                            return el;
-                        }}
-                        if ((overflowX === 'auto' || overflowX === 'scroll' || overflowX === 'overlay') && el.scrollWidth > el.clientWidth) {{
-                            return el;
-                        }}
-                        el = el.parentElement;
-                    }}
-                    
-                    // Try specific selectors
-                    for (var i = 0; i < selectors.length; i++) {{
-                        var elements = document.querySelectorAll(selectors[i]);
-                        for (var j = 0; j < elements.length; j++) {{
-                            var elem = elements[j];
-                            if (elem.scrollHeight > elem.clientHeight || elem.scrollWidth > elem.clientWidth) {{
-                                return elem;
-                            }}
-                        }}
-                    }}
-                    
-                    return null;
-                }}
-                
-                var scrollTarget = findScrollable();
-                var scrolled = false;
-                
-                if (scrollTarget && scrollTarget !== document.body && scrollTarget !== document.documentElement) {{
-                    // Scroll the specific container
-                    var beforeY = scrollTarget.scrollTop;
-                    var beforeX = scrollTarget.scrollLeft;
-                    scrollTarget.scrollBy(deltaX, deltaY);
-                    scrolled = (scrollTarget.scrollTop !== beforeY || scrollTarget.scrollLeft !== beforeX);
-                    console.log('Scrolled element:', scrollTarget.tagName, scrollTarget.className, 'by', deltaY);
-                }}
-                
-                // Also try window scroll as fallback or in addition
-                if (!scrolled) {{
-                    var beforeWinY = window.scrollY || window.pageYOffset;
-                    var beforeWinX = window.scrollX || window.pageXOffset;
-                    window.scrollBy(deltaX, deltaY);
-                    scrolled = (window.scrollY !== beforeWinY || window.scrollX !== beforeWinX);
-                    console.log('Scrolled window by', deltaY);
-                }}
-                
-                // Also dispatch wheel event for sites that listen for it
-                var wheelEvent = new WheelEvent('wheel', {{
-                    deltaX: deltaX,
-                    deltaY: deltaY,
-                    deltaMode: 0,
-                    bubbles: true,
-                    cancelable: true
-                }});
-                (scrollTarget || document.body).dispatchEvent(wheelEvent);
-                
-                return scrolled;
-            """
-            result = self.driver.execute_script(script)
+            self._mark_interacted()
+            result = self.driver.execute_script(SCROLL_SCRIPT, delta_x, delta_y)
             self.last_activity = time.time()
-            logger.info(f"Scroll sent: dx={delta_x}, dy={delta_y}, scrolled={result}")
+            logger.info("Scroll sent: dx=%s, dy=%s, scrolled=%s", delta_x, delta_y, result)
             return True, f"Scrolled by ({delta_x}, {delta_y})"
             
         except Exception as e:
-            logger.error(f"Error sending scroll: {e}")
+            logger.error("Error sending scroll: %s", e)
             return False, f"Error: {str(e)}"
     
     def send_text(self, text):
@@ -975,46 +1550,24 @@ class BrowserSession:
             if not self.driver:
                 return False, "Driver not initialized"
             
-            # First, try to find an active/focused input element
-            # If none is focused, try to find any visible input field and focus it
-            script = """
-                var activeElement = document.activeElement;
-                var isInputFocused = activeElement && 
-                    (activeElement.tagName === 'INPUT' || 
-                     activeElement.tagName === 'TEXTAREA' || 
-                     activeElement.isContentEditable);
-                
-                if (!isInputFocused) {
-                    // Try to find and focus a visible input field
-                    var inputs = document.querySelectorAll('input[type="text"], input[type="search"], input:not([type]), textarea, [contenteditable="true"]');
-                    for (var i = 0; i < inputs.length; i++) {
-                        var input = inputs[i];
-                        if (input.offsetParent !== null) { // Check if visible
-                            input.focus();
-                            input.scrollIntoView({behavior: 'instant', block: 'center'});
-                            return {focused: true, element: input.tagName, id: input.id || '', type: input.type || ''};
-                        }
-                    }
-                    return {focused: false, error: 'No input element found'};
-                }
-                return {focused: true, element: activeElement.tagName, id: activeElement.id || '', type: activeElement.type || ''};
-            """
-            
-            focus_result = self.driver.execute_script(script)
-            logger.info(f"Text input focus check: {focus_result}")
+            self._mark_interacted()
+            # Make sure an input element has focus before typing
+            focus_result = self.driver.execute_script(FOCUS_INPUT_SCRIPT)
+            logger.info("Text input focus check: %s", focus_result)
             
-            # Now send the text using ActionChains for natural typing
-            from selenium.webdriver.common.action_chains import ActionChains
-            actions = ActionChains(self.driver)
-            actions.send_keys(text)
-            actions.perform()
+            # Insert the whole string with one CDP call instead of per-key events
+            try:
+                self.execute_cdp('Input.insertText', {'text': text})
+            except Exception as e:
+                logger.debug("Input.insertText failed, typing with ActionChains: %s", e)
+                self._perform_keys(text)
             
             self.last_activity = time.time()
-            logger.info(f"Text sent: {text[:50]}...")
+            logger.info("Text sent: %s...", text[:50])
             return True, "Text sent successfully"
             
         except Exception as e:
-            logger.error(f"Error sending text: {e}")
+            logger.error("Error sending text: %s", e)
             return False, f"Error: {str(e)}"
     
     def send_key(self, key):
@@ -1023,116 +1576,386 @@ class BrowserSession:
             if not self.driver:
                 return False, "Driver not initialized"
             
-            from selenium.webdriver.common.keys import Keys
-            from selenium.webdriver.common.action_chains import ActionChains
-            
-            # Map key names to Selenium Keys
-            key_map = {
-                'Enter': Keys.ENTER,
-                'Backspace': Keys.BACKSPACE,
-                'Tab': Keys.TAB,
-                'Escape': Keys.ESCAPE,
-                'Delete': Keys.DELETE,
-                'ArrowUp': Keys.ARROW_UP,
-                'ArrowDown': Keys.ARROW_DOWN,
-                'ArrowLeft': Keys.ARROW_LEFT,
-                'ArrowRight': Keys.ARROW_RIGHT,
-                'Home': Keys.HOME,
-                'End': Keys.END,
-                'PageUp': Keys.PAGE_UP,
-                'PageDown': Keys.PAGE_DOWN,
-                'Space': Keys.SPACE,
-            }
-            
-            selenium_key = key_map.get(key)
+            selenium_key = SPECIAL_KEYS.get(key)
             if selenium_key:
-                actions = ActionChains(self.driver)
-                actions.send_keys(selenium_key)
-                actions.perform()
+                self._mark_interacted()
+                self._perform_keys(selenium_key)
                 self.last_activity = time.time()
-                logger.info(f"Key sent: {key}")
+                logger.info("Key sent: %s", key)
                 return True, f"Key {key} sent successfully"
             else:
                 return False, f"Unknown key: {key}"
             
         except Exception as e:
-            logger.error(f"Error sending key: {e}")
+            logger.error("Error sending key: %s", e)
             return False, f"Error: {str(e)}"
     
+    def _perform_keys(self, keys):
+        """Type keys through the session's reusable ActionChains"""
+        with self.actions_lock:
+            self.actions.send_keys(keys)
+            try:
+                self.actions.perform()
+            finally:
+                self.actions.reset_actions()
+    
+    def queue_input(self, event):
+        """Queue a WebSocket input event ({'type': 'click'|'scroll'|'text', ...})
+        
+        Events arriving within INPUT_BATCH_WINDOW are replayed together by
+        flush_input() so a burst costs one Selenium round-trip instead of one each.
+        Consecutive scrolls are summed and consecutive text is concatenated.
+        """
+        self._mark_interacted()
+        with self.input_lock:
+            last = self.input_queue[-1] if self.input_queue else None
+            if last is not None and last['type'] == event['type'] == 'scroll':
+                last['deltaX'] += event['deltaX']
+                last['deltaY'] += event['deltaY']
+            elif last is not None and last['type'] == event['type'] == 'text':
+                last['text'] += event['text']
+            else:
+                self.input_queue.append(dict(event))
+            if self.input_timer is None:
+                self.input_timer = threading.Timer(INPUT_BATCH_WINDOW, self.flush_input)
+                self.input_timer.daemon = True
+                self.input_timer.start()
+        self.last_activity = time.time()
+    
+    def flush_input(self):
+        """Send all queued input events to the browser, preserving order"""
+        # Serialize flushes so a slow batch can't be overtaken by the next one
+        with self.input_flush_lock:
+            with self.input_lock:
+                events = list(self.input_queue)
+                self.input_queue.clear()
+                self.input_timer = None
+            
+            if not events or not self.driver:
+                return
+            
+            batch = []
+            for event in events:
+                if event['type'] == 'text':
+                    # Text goes through CDP Input.insertText, so it breaks the JS batch
+                    self._run_input_batch(batch)
+                    batch = []
+                    self.send_text(event['text'])
+                else:
+                    batch.append(event)
+            self._run_input_batch(batch)
+    
+    def _run_input_batch(self, events):
+        """Replay click/scroll events with a single execute_script call"""
+        if not events:
+            return
+        has_click = any(event['type'] == 'click' for event in events)
+        try:
+            results = self.driver.execute_script(INPUT_BATCH_SCRIPT, events)
+            logger.debug("Input batch of %s event(s) sent to %s", len(events), self.session_id)
+            # Scroll results are just "did it move"; only clicks can fail, as in send_click
+            for event, result in zip(events, results or []):
+                if event['type'] == 'click' and not (isinstance(result, dict) and result.get('success')):
+                    logger.warning("Click at (%s, %s) - %s", event.get('x'), event.get('y'), result)
+        except Exception as e:
+            logger.error("Error sending input batch: %s", e)
+        finally:
+            self.dirty_seen = -1  # Force the next scheduled capture to see the result
+            if has_click:
+                self.page_info = None  # A click may have navigated
+    
     def keepalive(self):
         """Update last activity timestamp to keep session alive"""
         self.last_activity = time.time()
-        logger.info(f"Keepalive received for session {self.session_id}")
+        logger.info("Keepalive received for session %s", self.session_id)
         return True
     
     def is_expired(self, timeout=SESSION_TIMEOUT):
         """Check if session has expired based on inactivity"""
         return (time.time() - self.last_activity) > timeout
     
-    def capture_frame(self, target_width=240, target_height=296):
-        """Capture current browser frame as PNG screenshot - optimized for KaiOS display (240x296 + 24px status bar)"""
+    def set_capture_quality(self, quality):
+        """Capture at the quality WebSocket clients want (None = adaptive jpeg_quality)"""
+        # Only touch it when the value changes, so steady streams keep the screenshot hash valid
+        if quality != self.capture_quality:
+            self.capture_quality = quality
+            self.screenshot_hash = None
+    
+    def _grab_screenshot(self, quality):
+        """Grab the viewport as JPEG via CDP, falling back to WebDriver PNG"""
+        if not CDP_SCREENSHOTS:
+            return self.driver.get_screenshot_as_png()
+        try:
+            result = self.capture_screenshot_cdp({
+                'format': 'jpeg',
+                'quality': quality,
+                'optimizeForSpeed': True,
+                'captureBeyondViewport': False
+            })
+            return base64.b64decode(result['data'])
+        except Exception as e:
+            logger.debug("CDP screenshot failed, using PNG fallback: %s", e)
+            return self.driver.get_screenshot_as_png()
+    
+    def capture_frame(self, target_width=240, target_height=296, mark_active=True):
+        """Capture current browser frame as JPEG screenshot - optimized for KaiOS display (240x296 + 24px status bar)"""
         try:
             if not self.driver:
                 return None
             
-            # Capture screenshot from browser
-            screenshot = self.driver.get_screenshot_as_png()
-            
-            # Resize to fit KaiOS display (240x296)
-            img = Image.open(BytesIO(screenshot))
-            # Use high-quality resizing to maintain readability
-            img = img.resize((target_width, target_height), Image.Resampling.LANCZOS)
-            
-            # Convert back to PNG bytes
-            output = BytesIO()
-            img.save(output, format='PNG', optimize=True)
-            resized_screenshot = output.getvalue()
+            # Capture screenshot from browser, at the quality the frame will be stored at
+            quality = self.capture_quality or self.jpeg_quality
+            screenshot = self._grab_screenshot(quality)
+            
+            # Unchanged page: skip the resize and re-encode entirely
+            screenshot_hash = hashlib.blake2b(screenshot, digest_size=16).digest()
+            frame = self.last_frame
+            if screenshot_hash == self.screenshot_hash and frame is not None:
+                if mark_active:
+                    self.last_activity = time.time()
+                return frame
+            
+            # Resize to fit KaiOS display (240x296) and convert back to JPEG,
+            # reusing the session's encode buffer, off the event loop. A CDP
+            # JPEG already at the display size passes straight through.
+            with self.encode_lock:
+                resized_screenshot = run_blocking(
+                    resize_to_jpeg, screenshot, target_width, target_height,
+                    quality, self.encode_buffer, quality if CDP_SCREENSHOTS else None
+                )
+            self._adjust_quality(len(resized_screenshot))
             
             with self.frame_lock:
-                self.last_frame = resized_screenshot
-                self.last_activity = time.time()
+                # Keep the existing object for an unchanged page so consumers can
+                # skip it with an identity check
+                if resized_screenshot == self.last_frame:
+                    resized_screenshot = self.last_frame
+                else:
+                    self._install_frame(resized_screenshot, quality)
+                self.screenshot_hash = screenshot_hash
+                if mark_active:
+                    self.last_activity = time.time()
+            
+            url = self.loaded_url
+            if url is not None:
+                self.loaded_url = None
+                store_url_frame(url, resized_screenshot, quality)
             
             return resized_screenshot
         except Exception as e:
-            logger.error(f"Error capturing frame: {e}")
+            logger.error("Error capturing frame: %s", e)
+            return None
+    
+    def _install_frame(self, frame, quality):
+        """Make frame the current one; caller holds frame_lock"""
+        self.last_frame = frame
+        self.frame_quality = quality
+        self.frame_etag = hashlib.blake2b(frame, digest_size=8).hexdigest()
+        # Readers take this tuple without the lock, so frame and hash always match
+        self.frame_state = (frame, self.frame_etag)
+        # Derived copies of the old frame can't be served again; free them now
+        self.frame_b64 = None
+        self.scaled_frames = {}
+        self.lossless_frame = None
+        self.frame_ready.notify_all()
+    
+    def _adjust_quality(self, frame_size):
+        """Nudge JPEG quality so frames stay near FRAME_TARGET_BYTES"""
+        if FRAME_TARGET_BYTES <= 0:
+            return
+        if frame_size > FRAME_TARGET_BYTES * 1.2:
+            self.jpeg_quality = max(FRAME_QUALITY_MIN, self.jpeg_quality - FRAME_QUALITY_STEP)
+        elif frame_size < FRAME_TARGET_BYTES * 0.6:
+            self.jpeg_quality = min(FRAME_QUALITY_MAX, self.jpeg_quality + FRAME_QUALITY_STEP)
+    
+    def capture_frame_lossless(self, target_width=240, target_height=296):
+        """Capture current browser frame as lossless WebP for text-heavy pages
+        
+        Chrome only produces lossy WebP, so the PNG screenshot is re-encoded
+        with Pillow's fastest lossless mode. The cached JPEG frame is untouched.
+        """
+        try:
+            if not self.driver:
+                return None
+            
+            try:
+                result = self.capture_screenshot_cdp({
+                    'format': 'png',
+                    'optimizeForSpeed': True,
+                    'captureBeyondViewport': False
+                })
+                screenshot = base64.b64decode(result['data'])
+            except Exception as e:
+                logger.debug("CDP screenshot failed, using PNG fallback: %s", e)
+                screenshot = self.driver.get_screenshot_as_png()
+            
+            self.last_activity = time.time()
+            
+            # Lossless WebP is the slowest encode here; reuse it while the page is unchanged
+            key = (hashlib.blake2b(screenshot, digest_size=16).digest(), target_width, target_height)
+            cached = self.lossless_frame
+            if cached is not None and cached[0] == key:
+                return cached[1]
+            
+            frame = run_blocking(resize_to_webp_lossless, screenshot, target_width, target_height)
+            self.lossless_frame = (key, frame)
+            return frame
+        except Exception as e:
+            logger.error("Error capturing lossless frame: %s", e)
             return None
     
     def get_last_frame(self):
-        """Get the last captured frame"""
-        with self.frame_lock:
+        """Get the last captured frame
+        
+        Lock-free: frames are immutable bytes replaced by a single assignment;
+        frame_lock only serializes writers and backs frame_ready.
+        """
+        return self.last_frame
+    
+    def get_last_frame_with_etag(self):
+        """Get the last captured frame together with its content hash (lock-free snapshot)"""
+        return self.frame_state
+    
+    def wait_for_frame(self, previous, timeout=STREAM_WAIT_TIMEOUT):
+        """Block until last_frame is something other than previous (or timeout); return it"""
+        with self.frame_ready:
+            self.frame_ready.wait_for(
+                lambda: self.last_frame is not None and self.last_frame is not previous,
+                timeout
+            )
             return self.last_frame
     
+    def get_scaled_frame(self, frame, etag, width, height):
+        """Return (JPEG, etag) of frame shrunk to fit width x height, cached per frame and size"""
+        key = (width, height, etag)
+        scaled = self.scaled_frames.get(key)
+        if scaled is None:
+            scaled = run_blocking(scale_jpeg, frame, width, height, self.frame_quality or FRAME_JPEG_QUALITY)
+            self.scaled_frames[key] = scaled
+            # A few client sizes per frame; cleared whenever the frame changes
+            while len(self.scaled_frames) > SCALED_FRAME_CACHE_SIZE:
+                del self.scaled_frames[next(iter(self.scaled_frames))]
+        return scaled, f'{etag}-{width}x{height}'
+    
+    def get_last_frame_b64(self):
+        """Get the last frame base64-encoded (encoded once per unique frame) and its hash"""
+        with self.frame_lock:
+            if self.frame_b64 is None and self.last_frame is not None:
+                self.frame_b64 = b64encode_str(self.last_frame)
+            return self.frame_b64, self.frame_etag
+    
+    def start_capture_loop(self, interval=FRAME_CAPTURE_INTERVAL):
+        """Have the capture scheduler keep last_frame fresh every interval seconds"""
+        self.capture_interval = interval
+        self.capture_next_due = time.monotonic()
+        self.frame_capture_active = True
+    
+    def stop_capture_loop(self):
+        """Stop scheduled captures and wait for one in flight to finish"""
+        self.frame_capture_active = False
+        future = self.capture_future
+        if future is not None:
+            try:
+                future.result(timeout=FRAME_CAPTURE_INTERVAL + 5)
+            except Exception:
+                pass
+        self.capture_future = None
+    
+    def capture_and_push(self):
+        """One scheduled capture; keeps last_frame fresh for the stream endpoints"""
+        # A probe is far cheaper than a screenshot: skip the capture when the
+        # page reports no changes, but refresh every IDLE_CAPTURE_REFRESH anyway
+        dirty = -1
+        if CAPTURE_SKIP_IDLE:
+            dirty = self.probe_dirty()
+            if (dirty >= 0 and dirty == self.dirty_seen and self.last_frame is not None
+                    and time.monotonic() - self.last_capture_time < IDLE_CAPTURE_REFRESH):
+                return
+        
+        # Background captures must not count as user activity,
+        # otherwise the session would never expire
+        self.capture_frame(mark_active=False)
+        self.dirty_seen = dirty
+        self.last_capture_time = time.monotonic()
+    
     def close(self):
         """Close the browser session"""
+        self.closed = True
+        self.stop_capture_loop()
+        with self.input_lock:
+            if self.input_timer:
+                self.input_timer.cancel()
+                self.input_timer = None
+            self.input_queue.clear()
+        if self.cdp is not None:
+            self.cdp.close()
+            self.cdp = None
         try:
             if self.driver:
                 self.driver.quit()
-                logger.info(f"Browser session {self.session_id} closed")
+                logger.info("Browser session %s closed", self.session_id)
         except Exception as e:
-            logger.error(f"Error closing browser session: {e}")
+            logger.error("Error closing browser session: %s", e)
+
+
+def schedule_expiry(session):
+    """Register a session with the cleanup thread's expiration heap"""
+    expiry = session.last_activity + SESSION_TIMEOUT
+    with expiration_lock:
+        session.scheduled_expiry = expiry
+        heapq.heappush(expiration_heap, (expiry, session.session_id))
+    cleanup_event.set()
 
 
 def cleanup_expired_sessions():
-    """Background task to clean up expired sessions"""
+    """Background task to clean up expired sessions
+    
+    Sleeps until the earliest deadline in expiration_heap instead of polling.
+    Activity only ever pushes a deadline later, so keepalives don't touch the
+    heap: a due entry whose session was active since is simply re-scheduled.
+    Each session remembers the deadline of its live entry, so leftovers (e.g.
+    from an earlier session with the same ID) are dropped instead of re-pushed.
+    """
     while True:
         try:
-            time.sleep(60)  # Check every minute
-            expired_sessions = []
-            
-            for session_id, session in active_sessions.items():
-                if session.is_expired():
-                    expired_sessions.append(session_id)
-            
-            for session_id in expired_sessions:
-                logger.info(f"Cleaning up expired session: {session_id}")
+            with expiration_lock:
+                next_expiry = expiration_heap[0][0] if expiration_heap else None
+            # At most one sweep a second: deadlines that land close together expire in one batch
+            delay = None if next_expiry is None else max(1.0, next_expiry - time.time())
+            cleanup_event.wait(delay)
+            cleanup_event.clear()
+            
+            now = time.time()
+            due = []
+            with expiration_lock:
+                while expiration_heap and expiration_heap[0][0] <= now:
+                    due.append(heapq.heappop(expiration_heap))
+            
+            for deadline, session_id in due:
+                session = active_sessions.get(session_id)
+                if session is None or session.scheduled_expiry != deadline:
+                    continue  # Already closed, or a stale entry
+                
+                expiry = session.last_activity + SESSION_TIMEOUT
+                if expiry > now:
+                    schedule_expiry(session)
+                    continue
+                
+                logger.info("Cleaning up expired session: %s", session_id)
                 try:
-                    session = active_sessions[session_id]
-                    session.close()
-                    del active_sessions[session_id]
+                    with sessions_lock:
+                        if active_sessions.get(session_id) is session:
+                            del active_sessions[session_id]
+                        else:
+                            session = None
+                    if session:
+                        # Already unreachable; quit the browser without holding up other expiries
+                        _close_executor.submit(session.close)
                 except Exception as e:
-                    logger.error(f"Error cleaning up session {session_id}: {e}")
+                    logger.error("Error cleaning up session %s: %s", session_id, e)
         except Exception as e:
-            logger.error(f"Error in cleanup thread: {e}")
+            logger.error("Error in cleanup thread: %s", e)
+            time.sleep(1)
 
 
 def stream_frames_to_clients():
@@ -1154,11 +1977,16 @@ def stream_frames_to_clients():
                 if not session or not session.driver:
                     continue
                 
-                # Capture frame
+                # Capture frame, at the subscribers' quality when they agree on one
                 try:
+                    session.set_capture_quality(ws_handler.capture_quality_for(session_id))
                     frame_data = session.capture_frame()
                     if not frame_data:
                         continue
+                    # Clients at the capture quality get the cached JPEG without a re-encode;
+                    # the rest share one encode per quality for this tick
+                    source_quality = session.frame_quality
+                    encode_cache = {}
                     
                     # Find all clients subscribed to this session
                     clients_for_session = [
@@ -1169,16 +1997,41 @@ def stream_frames_to_clients():
                     # Send frame to each subscribed client
                     for client_id in clients_for_session:
                         try:
-                            # Get client's FPS setting
-                            client_fps = ws_handler.client_fps.get(client_id, 30)
+                            client = ws_handler.clients.get(client_id)
+                            if client is None:
+                                continue
+                            
+                            # Drop the frame for clients that are behind on acknowledgements
+                            if not ws_handler.should_send_frame(client_id):
+                                continue
+                            
+                            # Delta clients get only the changed rect while the page is mostly static
+                            if client.delta:
+                                kind, patch = ws_handler.prepare_delta(client_id, session_id, frame_data, encode_cache)
+                                if kind == 'skip':
+                                    continue
+                                if kind == 'delta':
+                                    rect, jpeg = patch
+                                    socketio.emit('frame:delta', {
+                                        'session_id': session_id,
+                                        'rect': rect,
+                                        'image': jpeg,
+                                        'timestamp': time.time()
+                                    }, room=client_id, callback=ws_handler.frame_ack_callback(client_id))
+                                    ws_handler.record_frame_sent(client_id, len(jpeg))
+                                    continue
+                            
+                            # Binary-batch clients get raw JPEGs coalesced into one message
+                            if client.binary_batch:
+                                ws_handler.queue_frame(client_id, ws_handler.encode_frame_jpeg(frame_data, client_id, source_quality, encode_cache))
+                                continue
                             
                             # Encode frame with client's quality settings
-                            encoded_frame, frame_size = ws_handler.encode_frame_for_websocket(frame_data, client_id)
+                            encoded_frame, frame_size, frame_scale = ws_handler.encode_frame_for_websocket(frame_data, client_id, source_quality, encode_cache)
                             
                             if encoded_frame:
                                 # Get bandwidth stats
-                                bandwidth_monitor = ws_handler.bandwidth_monitors.get(client_id)
-                                bandwidth_mbps = bandwidth_monitor.get_bandwidth_mbps() if bandwidth_monitor else 0
+                                bandwidth_mbps = client.monitor.get_bandwidth_mbps()
                                 
                                 # Emit frame to specific client
                                 socketio.emit('frame', {
@@ -1187,22 +2040,23 @@ def stream_frames_to_clients():
                                     'timestamp': time.time(),
                                     'stats': {
                                         'size': frame_size,
-                                        'quality': ws_handler.client_quality.get(client_id, 85),
-                                        'fps': client_fps,
+                                        'quality': client.quality,
+                                        'scale': frame_scale,
+                                        'fps': client.fps,
                                         'bandwidthMbps': round(bandwidth_mbps, 2),
-                                        'adaptive': ws_handler.adaptive_mode.get(client_id, True)
+                                        'adaptive': client.adaptive
                                     }
-                                }, room=client_id)
+                                }, room=client_id, callback=ws_handler.frame_ack_callback(client_id))
                                 
                         except Exception as e:
-                            logger.error(f"Error sending frame to client {client_id}: {e}")
+                            logger.error("Error sending frame to client %s: %s", client_id, e)
                 
                 except Exception as e:
-                    logger.error(f"Error capturing frame for session {session_id}: {e}")
+                    logger.error("Error capturing frame for session %s: %s", session_id, e)
             
             # Sleep based on highest FPS requirement among all clients
-            if ws_handler.client_fps:
-                max_fps = max(ws_handler.client_fps.values())
+            if ws_handler.clients:
+                max_fps = max(client.fps for client in list(ws_handler.clients.values()))
                 sleep_time = 1.0 / max_fps if max_fps > 0 else 0.033  # Default ~30 FPS
             else:
                 sleep_time = 0.033  # ~30 FPS default
@@ -1211,62 +2065,144 @@ def stream_frames_to_clients():
             time.sleep(max(sleep_time, 0.033))
             
         except Exception as e:
-            logger.error(f"Error in frame streaming thread: {e}")
+            logger.error("Error in frame streaming thread: %s", e)
             time.sleep(0.1)
 
 
+def current_frame(session):
+    """Return (frame, etag) for a session, capturing only if nothing is cached yet
+    
+    Serves the frame kept fresh by the capture loop and counts the read as activity.
+    """
+    frame, etag = session.get_last_frame_with_etag()
+    if frame is None:
+        session.capture_frame()
+        frame, etag = session.get_last_frame_with_etag()
+    else:
+        session.last_activity = time.time()
+    return frame, etag
+
+
+def requested_size(frame):
+    """(width, height) from ?w=&h= when it asks for something smaller than frame, else None"""
+    width = request.args.get('w', type=int)
+    height = request.args.get('h', type=int)
+    if not width and not height:
+        return None
+    frame_width, frame_height = Image.open(BytesIO(frame)).size
+    width = min(width or frame_width, frame_width)
+    height = min(height or frame_height, frame_height)
+    if width <= 0 or height <= 0 or (width, height) == (frame_width, frame_height):
+        return None
+    return width, height
+
+
+def not_modified(etag):
+    """Empty 304 response for a frame the client already has"""
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache, must-revalidate, max-age=0'
+    return response
+
+
+def run_capture_scheduler():
+    """Submit due background captures for every session to the shared pool
+    
+    A session whose previous capture is still running is skipped rather than
+    queued, so slow pages drop frames instead of piling up work.
+    """
+    logger.info("Frame capture scheduler started")
+    
+    while True:
+        try:
+            now = time.monotonic()
+            next_wake = now + FRAME_CAPTURE_INTERVAL
+            for session in list(active_sessions.values()):
+                if not session.frame_capture_active:
+                    continue
+                future = session.capture_future
+                if future is not None and not future.done():
+                    continue
+                if now >= session.capture_next_due:
+                    session.capture_next_due = now + session.capture_interval
+                    session.capture_future = _capture_executor.submit(session.capture_and_push)
+                next_wake = min(next_wake, session.capture_next_due)
+            time.sleep(max(0.005, next_wake - time.monotonic()))
+        except Exception as e:
+            logger.error("Error in frame capture scheduler: %s", e)
+            time.sleep(1)
+
+
 @app.route('/health', methods=['GET'])
 def health():
-    """Health check endpoint"""
-    return jsonify({
-        'status': 'healthy',
-        'service': 'jiomosa-renderer',
-        'selenium': f'{SELENIUM_HOST}:{SELENIUM_PORT}',
-        'active_sessions': len(active_sessions),
-        'websocket': 'enabled'
-    }), 200
+    """Health check endpoint (serialized body is reused for HEALTH_CACHE_TTL seconds)"""
+    now = time.time()
+    if now - _health_cache[0] > HEALTH_CACHE_TTL:
+        _health_cache[1] = app.json.dumps({
+            'status': 'healthy',
+            'service': 'jiomosa-renderer',
+            'selenium': f'{SELENIUM_HOST}:{SELENIUM_PORT}',
+            'active_sessions': len(active_sessions),
+            'websocket': 'enabled'
+        }).encode('utf-8')
+        _health_cache[0] = now
+    return Response(_health_cache[1], status=200, mimetype='application/json')
+
+
+# /api/info only reports static configuration, so its body is serialized once
+INFO_BODY = app.json.dumps({
+    'service': 'Jiomosa Renderer',
+    'version': '2.0.0',
+    'description': 'Cloud-based website rendering service with WebSocket streaming for low-end devices',
+    'streaming': 'WebSocket (Socket.IO)',
+    'endpoints': {
+        'health': '/health',
+        'info': '/api/info',
+        'session_create': '/api/session/create',
+        'session_load': '/api/session/<session_id>/load',
+        'session_info': '/api/session/<session_id>/info',
+        'session_keepalive': '/api/session/<session_id>/keepalive',
+        'session_close': '/api/session/<session_id>/close',
+        'sessions_list': '/api/sessions',
+        'session_frame': '/api/session/<session_id>/frame',
+        'session_frame_data': '/api/session/<session_id>/frame/data',
+        'session_frame_binary': '/api/session/<session_id>/frame/binary',
+        'session_stream_mjpeg': '/api/session/<session_id>/stream.mjpg',
+        'session_framebuffer_ws': 'ws://<host>:5000/api/session/<session_id>/fb',
+        'session_viewer': '/api/session/<session_id>/viewer',
+        'websocket': 'ws://<host>:5000/socket.io/'
+    },
+    'alternative_access': {
+        'description': 'Chrome noVNC web interface for direct browser access (optional)',
+        'url': 'http://localhost:7900',
+        'password': 'secret'
+    },
+    'session_config': {
+        'timeout': SESSION_TIMEOUT,
+        'frame_capture_interval': FRAME_CAPTURE_INTERVAL
+    }
+}).encode('utf-8')
+
+# Static part of the create_session response
+SESSION_ALTERNATIVE_ACCESS = {
+    'description': 'Chrome noVNC for direct browser viewing',
+    'url': 'http://localhost:7900',
+    'password': 'secret'
+}
 
 
 @app.route('/api/info', methods=['GET'])
 def info():
     """Get service information"""
-    return jsonify({
-        'service': 'Jiomosa Renderer',
-        'version': '2.0.0',
-        'description': 'Cloud-based website rendering service with WebSocket streaming for low-end devices',
-        'streaming': 'WebSocket (Socket.IO)',
-        'endpoints': {
-            'health': '/health',
-            'info': '/api/info',
-            'session_create': '/api/session/create',
-            'session_load': '/api/session/<session_id>/load',
-            'session_info': '/api/session/<session_id>/info',
-            'session_keepalive': '/api/session/<session_id>/keepalive',
-            'session_close': '/api/session/<session_id>/close',
-            'sessions_list': '/api/sessions',
-            'session_frame': '/api/session/<session_id>/frame',
-            'session_frame_data': '/api/session/<session_id>/frame/data',
-            'session_viewer': '/api/session/<session_id>/viewer',
-            'websocket': 'ws://<host>:5000/socket.io/'
-        },
-        'alternative_access': {
-            'description': 'Chrome noVNC web interface for direct browser access (optional)',
-            'url': 'http://localhost:7900',
-            'password': 'secret'
-        },
-        'session_config': {
-            'timeout': SESSION_TIMEOUT,
-            'frame_capture_interval': FRAME_CAPTURE_INTERVAL
-        }
-    }), 200
+    return Response(INFO_BODY, status=200, mimetype='application/json')
 
 
 @app.route('/api/session/create', methods=['POST'])
 def create_session():
     """Create a new browser session"""
     try:
-        data = request.get_json() or {}
-        session_id = data.get('session_id', f'session_{int(time.time())}')
+        data = request.get_json(silent=True, cache=True) or {}
+        session_id = data.get('session_id') or f'session_{next(_session_counter):x}'
         
         if session_id in active_sessions:
             return jsonify({
@@ -1280,22 +2216,28 @@ def create_session():
                 'error': 'Failed to initialize browser session'
             }), 500
         
-        active_sessions[session_id] = session
+        with sessions_lock:
+            registered = active_sessions.setdefault(session_id, session) is session
+        if not registered:
+            # Another request created the same session ID while we were initializing
+            session.close()
+            return jsonify({
+                'error': 'Session already exists',
+                'session_id': session_id
+            }), 400
+        session.start_capture_loop()
+        schedule_expiry(session)
         
         return jsonify({
             'success': True,
             'session_id': session_id,
             'created_at': session.created_at,
-            'websocket_url': f'ws://localhost:5000/socket.io/',
-            'alternative_access': {
-                'description': 'Chrome noVNC for direct browser viewing',
-                'url': 'http://localhost:7900',
-                'password': 'secret'
-            }
+            'websocket_url': 'ws://localhost:5000/socket.io/',
+            'alternative_access': SESSION_ALTERNATIVE_ACCESS
         }), 201
         
     except Exception as e:
-        logger.error(f"Error creating session: {e}")
+        logger.error("Error creating session: %s", e)
         return jsonify({'error': 'Failed to create session'}), 500
 
 
@@ -1303,23 +2245,23 @@ def create_session():
 def load_url(session_id):
     """Load a URL in an existing session"""
     try:
-        if session_id not in active_sessions:
+        session = active_sessions.get(session_id)
+        if session is None:
             return jsonify({
                 'error': 'Session not found',
                 'session_id': session_id
             }), 404
         
-        data = request.get_json() or {}
+        data = request.get_json(silent=True, cache=True) or {}
         url = data.get('url')
         
         if not url:
             return jsonify({'error': 'URL is required'}), 400
         
         # Add protocol if missing
-        if not url.startswith(('http://', 'https://')):
+        if not (url.startswith('https://') or url.startswith('http://')):
             url = 'https://' + url
         
-        session = active_sessions[session_id]
         success, message = session.load_url(url)
         
         if success:
@@ -1336,7 +2278,7 @@ def load_url(session_id):
             }), 500
             
     except Exception as e:
-        logger.error(f"Error loading URL: {e}")
+        logger.error("Error loading URL: %s", e)
         return jsonify({'error': 'Failed to load URL'}), 500
 
 
@@ -1344,13 +2286,13 @@ def load_url(session_id):
 def session_info(session_id):
     """Get information about a session"""
     try:
-        if session_id not in active_sessions:
+        session = active_sessions.get(session_id)
+        if session is None:
             return jsonify({
                 'error': 'Session not found',
                 'session_id': session_id
             }), 404
         
-        session = active_sessions[session_id]
         page_info = session.get_page_info()
         
         return jsonify({
@@ -1361,7 +2303,7 @@ def session_info(session_id):
         }), 200
         
     except Exception as e:
-        logger.error(f"Error getting session info: {e}")
+        logger.error("Error getting session info: %s", e)
         return jsonify({'error': 'Failed to get session info'}), 500
 
 
@@ -1369,19 +2311,18 @@ def session_info(session_id):
 def send_click(session_id):
     """Send click input to browser session"""
     try:
-        if session_id not in active_sessions:
+        session = active_sessions.get(session_id)
+        if session is None:
             return jsonify({'error': 'Session not found'}), 404
         
-        data = request.get_json() or {}
+        data = request.get_json(silent=True, cache=True) or {}
         x = data.get('x', 0)
         y = data.get('y', 0)
         
-        session = active_sessions[session_id]
-        
         # Client sends coordinates already mapped to viewport space (320x480)
         # Just use them directly
         mapped_x, mapped_y = int(x), int(y)
-        logger.info(f"Click at ({mapped_x},{mapped_y}) in viewport space")
+        logger.info("Click at (%s,%s) in viewport space", mapped_x, mapped_y)
         
         success, result = session.send_click(mapped_x, mapped_y)
         
@@ -1397,7 +2338,7 @@ def send_click(session_id):
         }), 200 if success else 500
         
     except Exception as e:
-        logger.error(f"Error sending click: {e}")
+        logger.error("Error sending click: %s", e)
         return jsonify({'error': 'Failed to send click'}), 500
 
 
@@ -1405,14 +2346,14 @@ def send_click(session_id):
 def send_scroll(session_id):
     """Send scroll input to browser session"""
     try:
-        if session_id not in active_sessions:
+        session = active_sessions.get(session_id)
+        if session is None:
             return jsonify({'error': 'Session not found'}), 404
         
-        data = request.get_json() or {}
+        data = request.get_json(silent=True, cache=True) or {}
         delta_x = data.get('deltaX', 0)
         delta_y = data.get('deltaY', 0)
         
-        session = active_sessions[session_id]
         success, message = session.send_scroll(delta_x, delta_y)
         
         return jsonify({
@@ -1422,7 +2363,7 @@ def send_scroll(session_id):
         }), 200 if success else 500
         
     except Exception as e:
-        logger.error(f"Error sending scroll: {e}")
+        logger.error("Error sending scroll: %s", e)
         return jsonify({'error': 'Failed to send scroll'}), 500
 
 
@@ -1430,13 +2371,13 @@ def send_scroll(session_id):
 def send_key(session_id):
     """Send a special key (Enter, Backspace, etc.) to browser session"""
     try:
-        if session_id not in active_sessions:
+        session = active_sessions.get(session_id)
+        if session is None:
             return jsonify({'error': 'Session not found'}), 404
         
-        data = request.get_json() or {}
+        data = request.get_json(silent=True, cache=True) or {}
         key = data.get('key', '')
         
-        session = active_sessions[session_id]
         success, message = session.send_key(key)
         
         return jsonify({
@@ -1445,7 +2386,7 @@ def send_key(session_id):
         }), 200 if success else 500
         
     except Exception as e:
-        logger.error(f"Error sending key: {e}")
+        logger.error("Error sending key: %s", e)
         return jsonify({'error': 'Failed to send key'}), 500
 
 
@@ -1453,13 +2394,13 @@ def send_key(session_id):
 def send_text(session_id):
     """Send text input to browser session"""
     try:
-        if session_id not in active_sessions:
+        session = active_sessions.get(session_id)
+        if session is None:
             return jsonify({'error': 'Session not found'}), 404
         
-        data = request.get_json() or {}
+        data = request.get_json(silent=True, cache=True) or {}
         text = data.get('text', '')
         
-        session = active_sessions[session_id]
         success, message = session.send_text(text)
         
         return jsonify({
@@ -1468,7 +2409,7 @@ def send_text(session_id):
         }), 200 if success else 500
         
     except Exception as e:
-        logger.error(f"Error sending text: {e}")
+        logger.error("Error sending text: %s", e)
         return jsonify({'error': 'Failed to send text'}), 500
 
 
@@ -1476,16 +2417,16 @@ def send_text(session_id):
 def execute_script(session_id):
     """Execute JavaScript in the browser session"""
     try:
-        if session_id not in active_sessions:
+        session = active_sessions.get(session_id)
+        if session is None:
             return jsonify({'error': 'Session not found'}), 404
         
-        data = request.get_json() or {}
+        data = request.get_json(silent=True, cache=True) or {}
         script = data.get('script', '')
         
         if not script:
             return jsonify({'error': 'Script is required'}), 400
         
-        session = active_sessions[session_id]
         if not session.driver:
             return jsonify({'error': 'Driver not initialized'}), 500
         
@@ -1499,14 +2440,14 @@ def execute_script(session_id):
                 'result': result  # Return as-is, Flask will JSON-serialize it
             }), 200
         except Exception as e:
-            logger.error(f"Script execution error: {e}")
+            logger.error("Script execution error: %s", e)
             return jsonify({
                 'success': False,
                 'error': str(e)
             }), 200  # Return 200 even on script error to differentiate from API errors
         
     except Exception as e:
-        logger.error(f"Error executing script: {e}")
+        logger.error("Error executing script: %s", e)
         return jsonify({'error': 'Failed to execute script'}), 500
 
 
@@ -1560,7 +2501,7 @@ def cleanup_old_cache():
         # Remove files older than max age
         for filepath, mtime, size in files_with_time:
             if now - mtime > max_age_seconds:
-                logger.info(f"Removing old cached video: {filepath}")
+                logger.info("Removing old cached video: %s", filepath)
                 os.remove(filepath)
                 total_size -= size
         
@@ -1570,14 +2511,14 @@ def cleanup_old_cache():
             files_with_time.sort(key=lambda x: x[1])  # Sort by mtime, oldest first
             for filepath, mtime, size in files_with_time:
                 if os.path.exists(filepath):
-                    logger.info(f"Removing cached video to free space: {filepath}")
+                    logger.info("Removing cached video to free space: %s", filepath)
                     os.remove(filepath)
                     total_size -= size
                     if total_size <= max_size_bytes * 0.8:  # Keep 20% buffer
                         break
                         
     except Exception as e:
-        logger.error(f"Error cleaning up cache: {e}")
+        logger.error("Error cleaning up cache: %s", e)
 
 
 def download_and_transcode_video(video_id, output_path):
@@ -1605,14 +2546,14 @@ def download_and_transcode_video(video_id, output_path):
         }
         
         # Download the video
-        logger.info(f"Downloading YouTube video: {video_id}")
+        logger.info("Downloading YouTube video: %s", video_id)
         url = f"https://www.youtube.com/watch?v={video_id}"
         
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
             info = ydl.extract_info(url, download=True)
             title = info.get('title', 'Unknown')
             duration = info.get('duration', 0)
-            logger.info(f"Downloaded: {title} ({duration}s)")
+            logger.info("Downloaded: %s (%ss)", title, duration)
         
         # Find the downloaded file (yt-dlp may add extension)
         actual_download = None
@@ -1633,7 +2574,7 @@ def download_and_transcode_video(video_id, output_path):
         
         # Transcode to H.264 Baseline profile for KaiOS compatibility
         # Using ffmpeg with settings optimized for KaiOS Gecko 48
-        logger.info(f"Transcoding to H.264 Baseline: {video_id}")
+        logger.info("Transcoding to H.264 Baseline: %s", video_id)
         
         ffmpeg_cmd = [
             'ffmpeg', '-y',
@@ -1661,7 +2602,7 @@ def download_and_transcode_video(video_id, output_path):
             os.remove(actual_download)
         
         if result.returncode != 0:
-            logger.error(f"FFmpeg error: {result.stderr}")
+            logger.error("FFmpeg error: %s", result.stderr)
             if os.path.exists(temp_path):
                 os.remove(temp_path)
             return False, f"Transcoding failed: {result.stderr[:200]}"
@@ -1671,7 +2612,7 @@ def download_and_transcode_video(video_id, output_path):
         
         # Get file size
         file_size = os.path.getsize(output_path)
-        logger.info(f"Video ready: {video_id} ({file_size / 1024:.1f} KB)")
+        logger.info("Video ready: %s (%.1f KB)", video_id, file_size / 1024)
         
         # Cleanup old cache files
         cleanup_old_cache()
@@ -1679,13 +2620,13 @@ def download_and_transcode_video(video_id, output_path):
         return True, {"title": title, "duration": duration, "size": file_size}
         
     except subprocess.TimeoutExpired:
-        logger.error(f"Transcoding timeout for video: {video_id}")
+        logger.error("Transcoding timeout for video: %s", video_id)
         for path in [temp_path, download_path]:
             if os.path.exists(path):
                 os.remove(path)
         return False, "Transcoding timeout"
     except Exception as e:
-        logger.error(f"Error downloading/transcoding video {video_id}: {e}")
+        logger.error("Error downloading/transcoding video %s: %s", video_id, e)
         for path in [temp_path, download_path]:
             if os.path.exists(path):
                 os.remove(path)
@@ -1731,7 +2672,7 @@ def youtube_video_info(video_id):
         })
         
     except Exception as e:
-        logger.error(f"Error getting video info for {video_id}: {e}")
+        logger.error("Error getting video info for %s: %s", video_id, e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -1940,7 +2881,7 @@ def youtube_stream_video(video_id):
         )
         
     except Exception as e:
-        logger.error(f"Error streaming video {video_id}: {e}")
+        logger.error("Error streaming video %s: %s", video_id, e)
         return jsonify({'error': 'Failed to stream video'}), 500
 
 
@@ -1969,7 +2910,7 @@ def youtube_list_cached():
         })
         
     except Exception as e:
-        logger.error(f"Error listing cached videos: {e}")
+        logger.error("Error listing cached videos: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -2000,7 +2941,7 @@ def serve_kaios_index():
 def serve_kaios_client(filename):
     """Serve KaiOS client files"""
     try:
-        logger.info(f"Serving KaiOS file: {filename}, from dir: {KAIOS_CLIENT_DIR}")
+        logger.info("Serving KaiOS file: %s, from dir: %s", filename, KAIOS_CLIENT_DIR)
         
         # Security: only allow specific file extensions
         allowed_extensions = ['.html', '.css', '.js', '.png', '.jpg', '.ico', '.svg', '.webapp', '.json', '.mp4', '.webm', '.ogg', '.mp3', '.wav']
@@ -2015,7 +2956,7 @@ def serve_kaios_client(filename):
             return jsonify({'error': 'Access denied'}), 403
         
         if not os.path.exists(file_path):
-            logger.error(f"KaiOS file not found: {file_path}")
+            logger.error("KaiOS file not found: %s", file_path)
             return jsonify({'error': 'KaiOS client not found', 'path': file_path}), 404
         
         # Determine content type
@@ -2040,23 +2981,30 @@ def serve_kaios_client(filename):
         return send_file(file_path, mimetype=content_type)
         
     except Exception as e:
-        logger.error(f"Error serving KaiOS file: {e}")
+        logger.error("Error serving KaiOS file: %s", e)
         return jsonify({'error': 'Failed to serve file'}), 500
 
 
 @app.route('/api/session/<session_id>/close', methods=['POST', 'DELETE'])
 def close_session(session_id):
-    """Close a browser session"""
+    """Close a browser session
+    
+    With ?async=1 the session is removed immediately and the browser quits in
+    the background.
+    """
     try:
-        if session_id not in active_sessions:
+        with sessions_lock:
+            session = active_sessions.pop(session_id, None)
+        if session is None:
             return jsonify({
                 'error': 'Session not found',
                 'session_id': session_id
             }), 404
         
-        session = active_sessions[session_id]
-        session.close()
-        del active_sessions[session_id]
+        if request.args.get('async') == '1':
+            _close_executor.submit(session.close)
+        else:
+            session.close()
         
         return jsonify({
             'success': True,
@@ -2064,22 +3012,28 @@ def close_session(session_id):
         }), 200
         
     except Exception as e:
-        logger.error(f"Error closing session: {e}")
+        logger.error("Error closing session: %s", e)
         return jsonify({'error': 'Failed to close session'}), 500
 
 
 @app.route('/api/sessions', methods=['GET'])
 def list_sessions():
-    """List all active sessions"""
+    """List all active sessions
+    
+    current_page is the last URL each session knew about, so listing costs no
+    Selenium round trips; ?refresh=1 asks every browser for its current URL.
+    """
     try:
+        refresh = request.args.get('refresh') == '1'
         sessions_list = []
-        for session_id, session in active_sessions.items():
-            page_info = session.get_page_info()
+        for session_id, session in list(active_sessions.items()):
+            if refresh:
+                session.get_page_info(max_age=0)
             sessions_list.append({
                 'session_id': session_id,
                 'created_at': session.created_at,
                 'last_activity': session.last_activity,
-                'current_page': page_info.get('url') if page_info else None
+                'current_page': session.current_url
             })
         
         return jsonify({
@@ -2088,7 +3042,7 @@ def list_sessions():
         }), 200
         
     except Exception as e:
-        logger.error(f"Error listing sessions: {e}")
+        logger.error("Error listing sessions: %s", e)
         return jsonify({'error': 'Failed to list sessions'}), 500
 
 
@@ -2096,13 +3050,13 @@ def list_sessions():
 def keepalive_session(session_id):
     """Send keepalive signal to maintain session"""
     try:
-        if session_id not in active_sessions:
+        session = active_sessions.get(session_id)
+        if session is None:
             return jsonify({
                 'error': 'Session not found',
                 'session_id': session_id
             }), 404
         
-        session = active_sessions[session_id]
         session.keepalive()
         
         return jsonify({
@@ -2113,7 +3067,7 @@ def keepalive_session(session_id):
         }), 200
         
     except Exception as e:
-        logger.error(f"Error sending keepalive: {e}")
+        logger.error("Error sending keepalive: %s", e)
         return jsonify({'error': 'Failed to send keepalive'}), 500
 
 
@@ -2121,299 +3075,521 @@ def keepalive_session(session_id):
 def get_frame(session_id):
     """Get current frame/screenshot from browser session"""
     try:
-        if session_id not in active_sessions:
+        session = active_sessions.get(session_id)
+        if session is None:
             return jsonify({
                 'error': 'Session not found',
                 'session_id': session_id
             }), 404
         
-        session = active_sessions[session_id]
-        frame = session.capture_frame()
-        
+        frame, etag = current_frame(session)
         if frame is None:
             return jsonify({'error': 'Failed to capture frame'}), 500
         
-        # Return image directly with cache control for high FPS streaming
-        response = send_file(
-            BytesIO(frame),
-            mimetype='image/png',
-            as_attachment=False,
-            download_name=f'{session_id}_frame.png'
-        )
-        # Prevent caching to ensure fresh frames at 30 FPS
-        response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate, max-age=0'
+        size = requested_size(frame)
+        if size:
+            frame, etag = session.get_scaled_frame(frame, etag, *size)
+        
+        # The client already has this frame
+        if request.if_none_match.contains(etag):
+            return not_modified(etag)
+        
+        # Return the in-memory bytes directly with cache control for high FPS streaming
+        response = Response(frame, mimetype='image/jpeg')
+        response.headers['Content-Length'] = str(len(frame))
+        # session_id comes from the URL; quotes or control characters would break the header
+        response.headers['Content-Disposition'] = f'inline; filename="{FILENAME_UNSAFE.sub("_", session_id)}_frame.jpg"'
+        # No Last-Modified: HTTP dates have 1 s resolution and frames change several
+        # times a second, so If-Modified-Since would 304 a newer frame. Only the ETag validates.
+        response.set_etag(etag)
+        # Always revalidate so clients see fresh frames at 30 FPS; unchanged ones cost a 304
+        response.headers['Cache-Control'] = 'no-cache, must-revalidate, max-age=0'
         response.headers['Pragma'] = 'no-cache'
         response.headers['Expires'] = '0'
         return response
         
     except Exception as e:
-        logger.error(f"Error getting frame: {e}")
+        logger.error("Error getting frame: %s", e)
         return jsonify({'error': 'Failed to get frame'}), 500
 
 
 @app.route('/api/session/<session_id>/frame/data', methods=['GET'])
 def get_frame_data(session_id):
-    """Get current frame as base64 encoded data"""
+    """Get current frame as base64 encoded data
+    
+    Query parameter ``format`` selects 'jpeg' (default) or 'webp' (lossless).
+    """
     try:
-        if session_id not in active_sessions:
+        session = active_sessions.get(session_id)
+        if session is None:
             return jsonify({
                 'error': 'Session not found',
                 'session_id': session_id
             }), 404
         
-        session = active_sessions[session_id]
-        frame = session.capture_frame()
+        frame_format = request.args.get('format', FRAME_DATA_FORMAT).lower()
+        if frame_format not in ('jpeg', 'webp'):
+            return jsonify({'error': 'format must be jpeg or webp'}), 400
         
+        if frame_format == 'webp':
+            frame = session.capture_frame_lossless()
+            if frame is None:
+                return jsonify({'error': 'Failed to capture frame'}), 500
+            return jsonify({
+                'success': True,
+                'session_id': session_id,
+                'timestamp': time.time(),
+                'frame': b64encode_str(frame),
+                'format': 'webp'
+            }), 200
+        
+        # Serve the frame kept fresh by the capture loop; only hit Selenium
+        # if nothing has been captured yet
+        frame, etag = current_frame(session)
         if frame is None:
             return jsonify({'error': 'Failed to capture frame'}), 500
         
+        size = requested_size(frame)
+        if size:
+            frame, etag = session.get_scaled_frame(frame, etag, *size)
+        
+        if request.if_none_match.contains(etag):
+            return not_modified(etag)
+        
+        # Binary-capable clients skip base64 and JSON; metadata moves to headers
+        if request.args.get('encoding') == 'binary':
+            response = Response(frame, mimetype='image/jpeg')
+            response.set_etag(etag)
+            response.headers['X-Frame-Timestamp'] = repr(time.time())
+            response.headers['X-Frame-Hash'] = etag
+            response.headers['X-Session-Id'] = session_id
+            response.headers['Cache-Control'] = 'no-cache, must-revalidate, max-age=0'
+            return response
+        
         # Return as JSON with base64 encoded image
-        frame_b64 = base64.b64encode(frame).decode('utf-8')
+        if size:
+            frame_b64 = b64encode_str(frame)
+        else:
+            frame_b64, etag = session.get_last_frame_b64()
         
-        return jsonify({
+        response = jsonify({
             'success': True,
             'session_id': session_id,
             'timestamp': time.time(),
             'frame': frame_b64,
-            'format': 'png'
-        }), 200
+            'format': 'jpeg'
+        })
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache, must-revalidate, max-age=0'
+        return response
         
     except Exception as e:
-        logger.error(f"Error getting frame data: {e}")
+        logger.error("Error getting frame data: %s", e)
         return jsonify({'error': 'Failed to get frame data'}), 500
 
 
-@app.route('/api/session/<session_id>/viewer', methods=['GET'])
-def viewer(session_id):
-    """HTML5 viewer page for framebuffer streaming"""
-    html_template = """
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>Jiomosa HTML5 Viewer - {{ session_id }}</title>
-        <style>
-            body {
-                margin: 0;
-                padding: 0;
-                background-color: #1a1a1a;
-                font-family: Arial, sans-serif;
-                display: flex;
-                flex-direction: column;
-                align-items: center;
-                justify-content: center;
-                min-height: 100vh;
-            }
-            .container {
-                max-width: 100%;
-                padding: 20px;
-            }
-            .header {
-                color: #fff;
-                text-align: center;
-                margin-bottom: 20px;
-            }
-            .viewer {
-                border: 2px solid #333;
-                box-shadow: 0 4px 6px rgba(0,0,0,0.3);
-                background-color: #000;
-                display: flex;
-                align-items: center;
-                justify-content: center;
-                min-height: 400px;
-            }
-            #frame {
-                max-width: 100%;
-                height: auto;
-                display: block;
-            }
-            .status {
-                color: #888;
-                text-align: center;
-                margin-top: 10px;
-                font-size: 14px;
-            }
-            .controls {
-                text-align: center;
-                margin-top: 20px;
-            }
-            button {
-                background-color: #4CAF50;
-                border: none;
-                color: white;
-                padding: 10px 20px;
-                text-align: center;
-                text-decoration: none;
-                display: inline-block;
-                font-size: 16px;
-                margin: 4px 2px;
-                cursor: pointer;
-                border-radius: 4px;
-            }
-            button:hover {
-                background-color: #45a049;
-            }
-            button.stop {
-                background-color: #f44336;
-            }
-            button.stop:hover {
-                background-color: #da190b;
-            }
-            .info {
-                color: #ccc;
-                text-align: center;
-                margin-top: 10px;
-                font-size: 12px;
-            }
-            .loading {
-                color: #fff;
-                font-size: 18px;
-            }
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <h1>Jiomosa HTML5 Viewer</h1>
-                <p>Session: <strong>{{ session_id }}</strong></p>
-            </div>
-            <div class="viewer">
-                <img id="frame" src="" alt="Loading browser frame..." />
-                <div id="loading" class="loading">Loading...</div>
-            </div>
-            <div class="status">
-                <span id="status">Initializing...</span>
-            </div>
-            <div class="controls">
-                <button id="startBtn" onclick="startStreaming()">Start</button>
-                <button id="stopBtn" class="stop" onclick="stopStreaming()">Stop</button>
-                <button onclick="captureFrame()">Capture Frame</button>
-            </div>
-            <div class="info">
-                <p>FPS: <span id="fps">0</span> | Last Update: <span id="lastUpdate">-</span></p>
-                <p>This viewer streams browser frames from the cloud to your ThreadX app WebView</p>
-            </div>
-        </div>
+@app.route('/api/session/<session_id>/frame/binary', methods=['GET'])
+def get_frame_binary(session_id):
+    """Get current frame as raw JPEG bytes behind a 12-byte header
+    
+    Header (network byte order): timestamp as double, JPEG length as uint32.
+    Avoids the base64 + JSON cost of /frame/data.
+    """
+    try:
+        session = active_sessions.get(session_id)
+        if session is None:
+            return jsonify({
+                'error': 'Session not found',
+                'session_id': session_id
+            }), 404
         
-        <script>
-            const sessionId = "{{ session_id }}";
-            let streamingInterval = null;
-            let frameCount = 0;
-            let lastFpsUpdate = Date.now();
-            let isStreaming = false;
-            
-            const frameImg = document.getElementById('frame');
-            const loadingDiv = document.getElementById('loading');
-            const statusSpan = document.getElementById('status');
-            const fpsSpan = document.getElementById('fps');
-            const lastUpdateSpan = document.getElementById('lastUpdate');
-            
-            async function captureFrame() {
-                try {
-                    const response = await fetch(`/api/session/${sessionId}/frame?t=${Date.now()}`);
-                    if (!response.ok) {
-                        throw new Error('Failed to fetch frame');
-                    }
-                    
-                    const blob = await response.blob();
-                    const imageUrl = URL.createObjectURL(blob);
-                    
-                    frameImg.src = imageUrl;
-                    frameImg.style.display = 'block';
-                    loadingDiv.style.display = 'none';
-                    
-                    updateStatus('Frame captured');
-                    updateLastUpdate();
-                    updateFPS();
-                    
-                    // Send keepalive
-                    await fetch(`/api/session/${sessionId}/keepalive`, {
-                        method: 'POST'
-                    });
-                    
-                } catch (error) {
-                    console.error('Error capturing frame:', error);
-                    updateStatus('Error: ' + error.message);
-                }
-            }
-            
-            function startStreaming() {
-                if (isStreaming) return;
-                
-                isStreaming = true;
-                updateStatus('Streaming...');
-                
-                // Capture immediately
-                captureFrame();
-                
-                // Then capture every second
-                streamingInterval = setInterval(captureFrame, 1000);
+        frame, etag = current_frame(session)
+        if frame is None:
+            return jsonify({'error': 'Failed to capture frame'}), 500
+        
+        # The client already has this frame
+        if request.if_none_match.contains(etag):
+            return not_modified(etag)
+        
+        response = Response(
+            FRAME_HEADER.pack(time.time(), len(frame)) + frame,
+            mimetype='application/octet-stream'
+        )
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache, must-revalidate, max-age=0'
+        return response
+        
+    except Exception as e:
+        logger.error("Error getting binary frame: %s", e)
+        return jsonify({'error': 'Failed to get binary frame'}), 500
+
+
+@app.route('/api/session/<session_id>/stream.mjpg', methods=['GET'])
+def stream_mjpeg(session_id):
+    """Stream frames as multipart/x-mixed-replace MJPEG for direct use in an <img>"""
+    session = active_sessions.get(session_id)
+    if session is None:
+        return jsonify({
+            'error': 'Session not found',
+            'session_id': session_id
+        }), 404
+    
+    def generate():
+        last_sent = None
+        # Stop once the session is closed or replaced
+        while active_sessions.get(session_id) is session:
+            frame = session.wait_for_frame(last_sent)
+            if frame is not None and frame is not last_sent:
+                last_sent = frame
+                yield MJPEG_PART_HEADER % len(frame) + frame + b'\r\n'
+    
+    response = Response(generate(), mimetype='multipart/x-mixed-replace; boundary=frame')
+    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate, max-age=0'
+    return response
+
+
+@app.route('/api/session/<session_id>/fb', methods=['GET'])
+def stream_framebuffer(session_id):
+    """Push JPEG frames over a plain WebSocket as raw binary messages
+
+    Pixels only; input and control stay on Socket.IO. Needs the gevent server,
+    whose WebSocket handler upgrades the request and exposes it in the environ.
+    """
+    ws = request.environ.get('wsgi.websocket')
+    if ws is None:
+        return jsonify({'error': 'WebSocket upgrade required'}), 400
+    tune_peer_socket(request.environ)
+    
+    session = active_sessions.get(session_id)
+    if session is None:
+        ws.close()
+        return Response()
+    
+    last_sent = None
+    try:
+        # Same loop as the MJPEG stream; a slow reader simply skips frames
+        while not ws.closed and active_sessions.get(session_id) is session:
+            frame = session.wait_for_frame(last_sent)
+            if frame is not None and frame is not last_sent:
+                last_sent = frame
+                ws.send(frame, binary=True)
+    except Exception as e:
+        logger.debug("Framebuffer socket for %s closed: %s", session_id, e)
+    return Response()
+
+
+# Viewer page split once at import around its only placeholder, so serving it is
+# a join with the HTML-escaped session ID (what autoescaped Jinja would produce)
+VIEWER_PAGE_PARTS = """
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Jiomosa HTML5 Viewer - {{ session_id }}</title>
+    <style>
+        body {
+            margin: 0;
+            padding: 0;
+            background-color: #1a1a1a;
+            font-family: Arial, sans-serif;
+            display: flex;
+            flex-direction: column;
+            align-items: center;
+            justify-content: center;
+            min-height: 100vh;
+        }
+        .container {
+            max-width: 100%;
+            padding: 20px;
+        }
+        .header {
+            color: #fff;
+            text-align: center;
+            margin-bottom: 20px;
+        }
+        .viewer {
+            border: 2px solid #333;
+            box-shadow: 0 4px 6px rgba(0,0,0,0.3);
+            background-color: #000;
+            display: flex;
+            align-items: center;
+            justify-content: center;
+            min-height: 400px;
+        }
+        #frame {
+            max-width: 100%;
+            height: auto;
+            display: block;
+        }
+        .status {
+            color: #888;
+            text-align: center;
+            margin-top: 10px;
+            font-size: 14px;
+        }
+        .controls {
+            text-align: center;
+            margin-top: 20px;
+        }
+        button {
+            background-color: #4CAF50;
+            border: none;
+            color: white;
+            padding: 10px 20px;
+            text-align: center;
+            text-decoration: none;
+            display: inline-block;
+            font-size: 16px;
+            margin: 4px 2px;
+            cursor: pointer;
+            border-radius: 4px;
+        }
+        button:hover {
+            background-color: #45a049;
+        }
+        button.stop {
+            background-color: #f44336;
+        }
+        button.stop:hover {
+            background-color: #da190b;
+        }
+        .info {
+            color: #ccc;
+            text-align: center;
+            margin-top: 10px;
+            font-size: 12px;
+        }
+        .loading {
+            color: #fff;
+            font-size: 18px;
+        }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>Jiomosa HTML5 Viewer</h1>
+            <p>Session: <strong>{{ session_id }}</strong></p>
+        </div>
+        <div class="viewer">
+            <img id="frame" src="" alt="Loading browser frame..." />
+            <div id="loading" class="loading">Loading...</div>
+        </div>
+        <div class="status">
+            <span id="status">Initializing...</span>
+        </div>
+        <div class="controls">
+            <button id="startBtn" onclick="startStreaming()">Start</button>
+            <button id="stopBtn" class="stop" onclick="stopStreaming()">Stop</button>
+            <button onclick="captureFrame()">Capture Frame</button>
+        </div>
+        <div class="info">
+            <p>FPS: <span id="fps">0</span> | Last Update: <span id="lastUpdate">-</span></p>
+            <p>This viewer streams browser frames from the cloud to your ThreadX app WebView</p>
+        </div>
+    </div>
+
+    <script>
+        const sessionId = "{{ session_id }}";
+        let frameUrl = null;
+        let keepaliveInterval = null;
+        let frameCount = 0;
+        let lastFpsUpdate = Date.now();
+        let isStreaming = false;
+        let frameSocket = null;
+
+        const frameImg = document.getElementById('frame');
+        const loadingDiv = document.getElementById('loading');
+        const statusSpan = document.getElementById('status');
+        const fpsSpan = document.getElementById('fps');
+        const lastUpdateSpan = document.getElementById('lastUpdate');
+
+        function showFrame(blob) {
+            // Release the previous frame before swapping in the new one
+            if (frameUrl) {
+                URL.revokeObjectURL(frameUrl);
             }
-            
-            function stopStreaming() {
-                if (!isStreaming) return;
-                
-                isStreaming = false;
-                if (streamingInterval) {
-                    clearInterval(streamingInterval);
-                    streamingInterval = null;
+            frameUrl = URL.createObjectURL(blob);
+
+            frameImg.src = frameUrl;
+            frameImg.style.display = 'block';
+            loadingDiv.style.display = 'none';
+
+            updateLastUpdate();
+            updateFPS();
+        }
+
+        async function captureFrame() {
+            try {
+                // Revalidate with the ETag instead of cache-busting; an unchanged frame costs a 304
+                const response = await fetch(`/api/session/${sessionId}/frame/binary`, { cache: 'no-cache' });
+                if (!response.ok) {
+                    throw new Error('Failed to fetch frame');
                 }
-                updateStatus('Streaming stopped');
+
+                // Skip the 12-byte header (timestamp double + length uint32)
+                const buf = await response.arrayBuffer();
+                const length = new DataView(buf).getUint32(8);
+                showFrame(new Blob([new Uint8Array(buf, 12, length)], { type: 'image/jpeg' }));
+                updateStatus('Frame captured');
+
+            } catch (error) {
+                console.error('Error capturing frame:', error);
+                updateStatus('Error: ' + error.message);
             }
-            
-            function updateStatus(message) {
-                statusSpan.textContent = message;
+        }
+
+        function sendKeepalive() {
+            fetch(`/api/session/${sessionId}/keepalive`, { method: 'POST' });
+        }
+
+        function startStreaming() {
+            if (isStreaming) return;
+
+            isStreaming = true;
+            updateStatus('Streaming...');
+
+            // The server pushes each new JPEG as one binary WebSocket message,
+            // only when the frame changed; MJPEG is the fallback
+            const scheme = location.protocol === 'https:' ? 'wss:' : 'ws:';
+            let gotFrame = false;
+            const socket = new WebSocket(`${scheme}//${location.host}/api/session/${sessionId}/fb`);
+            socket.binaryType = 'blob';
+            socket.onmessage = (event) => {
+                gotFrame = true;
+                showFrame(event.data);
+            };
+            socket.onclose = () => {
+                if (frameSocket !== socket) return;  // Stopped or replaced
+                frameSocket = null;
+                if (isStreaming && !gotFrame) {
+                    startMjpeg();
+                }
+            };
+            frameSocket = socket;
+
+            sendKeepalive();
+            keepaliveInterval = setInterval(sendKeepalive, 30000);
+        }
+
+        function startMjpeg() {
+            // The <img> decodes each multipart JPEG itself
+            frameImg.onload = () => {
+                frameImg.style.display = 'block';
+                loadingDiv.style.display = 'none';
+                updateLastUpdate();
+                updateFPS();
+            };
+            frameImg.src = `/api/session/${sessionId}/stream.mjpg`;
+        }
+
+        function stopStreaming() {
+            if (!isStreaming) return;
+
+            isStreaming = false;
+            if (frameSocket) {
+                frameSocket.close();
+                frameSocket = null;
             }
-            
-            function updateLastUpdate() {
-                const now = new Date();
-                lastUpdateSpan.textContent = now.toLocaleTimeString();
+            // Dropping the src closes the MJPEG connection
+            frameImg.onload = null;
+            frameImg.src = '';
+            if (keepaliveInterval) {
+                clearInterval(keepaliveInterval);
+                keepaliveInterval = null;
             }
-            
-            function updateFPS() {
-                frameCount++;
-                const now = Date.now();
-                const elapsed = now - lastFpsUpdate;
-                
-                if (elapsed >= 1000) {
-                    const fps = Math.round(frameCount / (elapsed / 1000));
-                    fpsSpan.textContent = fps;
-                    frameCount = 0;
-                    lastFpsUpdate = now;
-                }
+            updateStatus('Streaming stopped');
+        }
+
+        function updateStatus(message) {
+            statusSpan.textContent = message;
+        }
+
+        function updateLastUpdate() {
+            const now = new Date();
+            lastUpdateSpan.textContent = now.toLocaleTimeString();
+        }
+
+        function updateFPS() {
+            frameCount++;
+            const now = Date.now();
+            const elapsed = now - lastFpsUpdate;
+
+            if (elapsed >= 1000) {
+                const fps = Math.round(frameCount / (elapsed / 1000));
+                fpsSpan.textContent = fps;
+                frameCount = 0;
+                lastFpsUpdate = now;
             }
-            
-            // Auto-start streaming on page load
-            window.addEventListener('load', () => {
-                setTimeout(startStreaming, 500);
-            });
-            
-            // Cleanup on page unload
-            window.addEventListener('beforeunload', () => {
-                stopStreaming();
-            });
-        </script>
-    </body>
-    </html>
-    """
-    
-    return render_template_string(html_template, session_id=session_id)
+        }
+
+        // Auto-start streaming on page load
+        window.addEventListener('load', () => {
+            setTimeout(startStreaming, 500);
+        });
+
+        // Cleanup on page unload
+        window.addEventListener('beforeunload', () => {
+            stopStreaming();
+        });
+    </script>
+</body>
+</html>
+""".split('{{ session_id }}')
+
+
+@app.route('/api/session/<session_id>/viewer', methods=['GET'])
+def viewer(session_id):
+    """HTML5 viewer page for framebuffer streaming"""
+    response = Response(str(escape(session_id)).join(VIEWER_PAGE_PARTS), mimetype='text/html')
+    # The page only depends on session_id, so browsers may reuse it
+    response.headers['Cache-Control'] = 'public, max-age=3600'
+    return response
 
 
 # ============================================================================
 # WebSocket Event Handlers for Real-time Framebuffer Streaming
 # ============================================================================
 
+# Kernel keepalive for WebSocket peers: probe after 5s idle, every 2s, give up after 3 misses
+TCP_KEEPALIVE_OPTIONS = [
+    (name, value) for name, value in (('TCP_KEEPIDLE', 5), ('TCP_KEEPINTVL', 2), ('TCP_KEEPCNT', 3))
+    if hasattr(socket, name)
+]
+
+
+def tune_peer_socket(environ):
+    """Enable TCP keepalive and a user timeout on a WebSocket client's socket
+    
+    Lets the kernel reset dead mobile peers within seconds, so the disconnect
+    handler runs before the heartbeat would notice. Polling clients have no
+    long-lived socket and are left alone.
+    """
+    ws = environ.get('wsgi.websocket')
+    sock = getattr(getattr(ws, 'handler', None), 'socket', None)
+    if sock is None:
+        return
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        for name, value in TCP_KEEPALIVE_OPTIONS:
+            sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, name), value)
+        if hasattr(socket, 'TCP_USER_TIMEOUT'):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_USER_TIMEOUT, TCP_USER_TIMEOUT_MS)
+    except OSError as e:
+        logger.debug("Could not set keepalive options: %s", e)
+
+
 @socketio.on('connect')
 def handle_websocket_connect():
     """Handle new WebSocket connection"""
-    logger.info(f"WebSocket client connected: {request.sid}")
+    logger.info("WebSocket client connected: %s", request.sid)
+    tune_peer_socket(request.environ)
     emit('status', {'message': 'Connected to Jiomosa renderer', 'type': 'connection'})
 
 
 @socketio.on('disconnect')
 def handle_websocket_disconnect():
     """Handle WebSocket disconnection"""
-    logger.info(f"WebSocket client disconnected: {request.sid}")
+    logger.info("WebSocket client disconnected: %s", request.sid)
     # Clean up any active subscriptions
     if ws_handler:
         ws_handler.handle_unsubscribe(request.sid)
@@ -2423,7 +3599,13 @@ def handle_websocket_disconnect():
 def handle_subscribe(data):
     """Subscribe to framebuffer streaming for a session
     
-    Expected data: {'session_id': 'session-xyz'}
+    Expected data: {'session_id': 'session-xyz', 'binary_batch': true}
+    
+    With binary_batch set, frames arrive as 'frames_batch' binary messages
+    (length-prefixed JPEGs) instead of one base64 'frame' event each.
+    With delta set, unchanged frames are skipped and small changes arrive as
+    'frame:delta' patches ({rect: [x, y, w, h], image: JPEG bytes}) to draw over the last
+    frame. Delta takes precedence over binary_batch so patches stay in order.
     """
     global ws_handler
     if not ws_handler:
@@ -2439,8 +3621,10 @@ def handle_subscribe(data):
         emit('error', {'message': f'Session {session_id} not found'})
         return
     
-    logger.info(f"Client {request.sid} subscribed to session {session_id}")
-    ws_handler.handle_subscribe(request.sid, session_id, emit)
+    logger.info("Client %s subscribed to session %s", request.sid, session_id)
+    delta = bool(data.get('delta'))
+    binary_batch = bool(data.get('binary_batch')) and not delta
+    ws_handler.handle_subscribe(request.sid, session_id, emit, binary_batch=binary_batch, delta=delta)
     emit('subscribed', {'session_id': session_id, 'message': 'Subscribed to framebuffer stream'})
 
 
@@ -2450,25 +3634,48 @@ def handle_unsubscribe(data):
     global ws_handler
     if ws_handler:
         session_id = data.get('session_id', 'unknown')
-        logger.info(f"Client {request.sid} unsubscribed from session {session_id}")
+        logger.info("Client %s unsubscribed from session %s", request.sid, session_id)
         ws_handler.handle_unsubscribe(request.sid)
     emit('unsubscribed', {'message': 'Unsubscribed from framebuffer stream'})
 
 
+def subscribed_session():
+    """Return (session_id, session) for the calling framebuffer client
+    
+    Emits an error and returns a None session when the handler isn't ready
+    or the client isn't subscribed. Input handlers return their ack payload,
+    which Socket.IO only sends when the client asked for a callback, so a
+    fire-and-forget input costs no reply message.
+    """
+    handler = ws_handler
+    if not handler:
+        emit('error', {'message': 'WebSocket handler not initialized'})
+        return None, None
+    client = handler.clients.get(request.sid)
+    if client is None:
+        emit('error', {'message': 'Not subscribed to any session'})
+        return None, None
+    session = client.session
+    if session is not None and not session.closed:
+        return session.session_id, session
+    # Session closed (or not yet created at subscribe time): follow the ID to its current session
+    session_id = client.session_id
+    session = active_sessions.get(session_id)
+    if session is None:
+        emit('error', {'message': 'Not subscribed to any session'})
+    else:
+        client.session = session
+    return session_id, session
+
+
 @socketio.on('input:click')
 def handle_input_click(data):
     """Handle click input event
     
     Expected data: {'x': 100, 'y': 200}
     """
-    global ws_handler
-    if not ws_handler:
-        emit('error', {'message': 'WebSocket handler not initialized'})
-        return
-    
-    session_id = ws_handler.get_session_id_for_client(request.sid)
-    if not session_id or session_id not in active_sessions:
-        emit('error', {'message': 'Not subscribed to any session'})
+    session_id, session = subscribed_session()
+    if session is None:
         return
     
     x = data.get('x')
@@ -2478,12 +3685,11 @@ def handle_input_click(data):
         return
     
     try:
-        session = active_sessions[session_id]
-        session.send_click(x, y)
-        logger.debug(f"Click event sent to {session_id}: ({x}, {y})")
-        emit('input:acknowledged', {'type': 'click', 'x': x, 'y': y})
+        session.queue_input({'type': 'click', 'x': x, 'y': y})
+        logger.debug("Click event queued for %s: (%s, %s)", session_id, x, y)
+        return {'type': 'click', 'x': x, 'y': y}
     except Exception as e:
-        logger.error(f"Error sending click to {session_id}: {e}")
+        logger.error("Error sending click to %s: %s", session_id, e)
         emit('error', {'message': f'Failed to send click: {str(e)}'})
 
 
@@ -2493,26 +3699,19 @@ def handle_input_scroll(data):
     
     Expected data: {'deltaX': 0, 'deltaY': 50}
     """
-    global ws_handler
-    if not ws_handler:
-        emit('error', {'message': 'WebSocket handler not initialized'})
-        return
-    
-    session_id = ws_handler.get_session_id_for_client(request.sid)
-    if not session_id or session_id not in active_sessions:
-        emit('error', {'message': 'Not subscribed to any session'})
+    session_id, session = subscribed_session()
+    if session is None:
         return
     
     deltaX = data.get('deltaX', 0)
     deltaY = data.get('deltaY', 0)
     
     try:
-        session = active_sessions[session_id]
-        session.send_scroll(deltaX, deltaY)
-        logger.debug(f"Scroll event sent to {session_id}: ({deltaX}, {deltaY})")
-        emit('input:acknowledged', {'type': 'scroll', 'deltaX': deltaX, 'deltaY': deltaY})
+        session.queue_input({'type': 'scroll', 'deltaX': deltaX, 'deltaY': deltaY})
+        logger.debug("Scroll event queued for %s: (%s, %s)", session_id, deltaX, deltaY)
+        return {'type': 'scroll', 'deltaX': deltaX, 'deltaY': deltaY}
     except Exception as e:
-        logger.error(f"Error sending scroll to {session_id}: {e}")
+        logger.error("Error sending scroll to %s: %s", session_id, e)
         emit('error', {'message': f'Failed to send scroll: {str(e)}'})
 
 
@@ -2520,33 +3719,62 @@ def handle_input_scroll(data):
 def handle_input_text(data):
     """Handle text input event
     
-    Expected data: {'text': 'hello'}
+    Expected data: {'text': 'hello'} (text may be UTF-8 bytes with the msgpack serializer)
     """
-    global ws_handler
-    if not ws_handler:
-        emit('error', {'message': 'WebSocket handler not initialized'})
-        return
-    
-    session_id = ws_handler.get_session_id_for_client(request.sid)
-    if not session_id or session_id not in active_sessions:
-        emit('error', {'message': 'Not subscribed to any session'})
+    session_id, session = subscribed_session()
+    if session is None:
         return
     
     text = data.get('text', '')
     if not text:
         emit('error', {'message': 'text is required'})
         return
+    if isinstance(text, bytes):
+        text = text.decode('utf-8', 'replace')
     
     try:
-        session = active_sessions[session_id]
-        session.send_text(text)
-        logger.debug(f"Text event sent to {session_id}: '{text}'")
-        emit('input:acknowledged', {'type': 'text', 'length': len(text)})
+        session.queue_input({'type': 'text', 'text': text})
+        logger.debug("Text event queued for %s: '%s'", session_id, text)
+        return {'type': 'text', 'length': len(text)}
     except Exception as e:
-        logger.error(f"Error sending text to {session_id}: {e}")
+        logger.error("Error sending text to %s: %s", session_id, e)
         emit('error', {'message': f'Failed to send text: {str(e)}'})
 
 
+@socketio.on('input')
+def handle_input_batch(data):
+    """Handle one or more input events in a single message
+    
+    Expected data: {'type': 'click', 'x': 100, 'y': 200} or a list of such
+    events, e.g. [{'type': 'scroll', 'deltaX': 0, 'deltaY': 50},
+    {'type': 'text', 'text': 'hello'}]
+    """
+    session_id, session = subscribed_session()
+    if session is None:
+        return
+    
+    events = data if isinstance(data, list) else [data]
+    queued = 0
+    for event in events:
+        event_type = event.get('type') if isinstance(event, dict) else None
+        if event_type == 'click' and event.get('x') is not None and event.get('y') is not None:
+            session.queue_input({'type': 'click', 'x': event['x'], 'y': event['y']})
+        elif event_type == 'scroll':
+            session.queue_input({'type': 'scroll', 'deltaX': event.get('deltaX', 0), 'deltaY': event.get('deltaY', 0)})
+        elif event_type == 'text' and event.get('text'):
+            text = event['text']
+            if isinstance(text, bytes):
+                # msgpack clients send UTF-8 bytes; queue_input concatenates text as str
+                text = text.decode('utf-8', 'replace')
+            session.queue_input({'type': 'text', 'text': text})
+        else:
+            emit('error', {'message': f'Invalid input event: {event}'})
+            continue
+        queued += 1
+    
+    return {'type': 'batch', 'count': queued}
+
+
 @socketio.on('quality:set')
 def handle_quality_set(data):
     """Set JPEG quality for frame compression
@@ -2565,7 +3793,7 @@ def handle_quality_set(data):
     
     client_id = request.sid
     ws_handler.set_quality(client_id, quality)
-    logger.info(f"Quality set to {quality} for client {client_id}")
+    logger.info("Quality set to %s for client %s", quality, client_id)
     emit('quality:updated', {'quality': quality})
 
 
@@ -2587,7 +3815,7 @@ def handle_fps_set(data):
     
     client_id = request.sid
     ws_handler.set_fps(client_id, fps)
-    logger.info(f"FPS set to {fps} for client {client_id}")
+    logger.info("FPS set to %s for client %s", fps, client_id)
     emit('fps:updated', {'fps': fps})
 
 
@@ -2595,7 +3823,9 @@ def handle_fps_set(data):
 def handle_adaptive_toggle(data):
     """Toggle adaptive quality mode
     
-    Expected data: {'enabled': True}
+    Expected data: {'enabled': True, 'high_water': 2, 'drop_at': 4, 'fast_rtt_ms': 50}
+    
+    The threshold keys are optional and tune the ack-driven backpressure.
     """
     global ws_handler
     if not ws_handler:
@@ -2604,8 +3834,12 @@ def handle_adaptive_toggle(data):
     
     enabled = data.get('enabled', True)
     client_id = request.sid
-    ws_handler.toggle_adaptive_mode(client_id, enabled)
-    logger.info(f"Adaptive mode set to {enabled} for client {client_id}")
+    thresholds = {
+        key: float(data[key]) for key in ('high_water', 'drop_at', 'fast_rtt_ms')
+        if isinstance(data.get(key), (int, float))
+    }
+    ws_handler.toggle_adaptive_mode(client_id, enabled, thresholds)
+    logger.info("Adaptive mode set to %s for client %s", enabled, client_id)
     emit('adaptive:updated', {'enabled': enabled})
 
 
@@ -2633,7 +3867,7 @@ def handle_audio_subscribe(data):
         emit('error', {'message': f'Session {session_id} not found'})
         return
     
-    logger.info(f"Client {request.sid} subscribing to audio for session {session_id}")
+    logger.info("Client %s subscribing to audio for session %s", request.sid, session_id)
     audio_streamer.subscribe_client(request.sid, session_id)
     emit('audio:subscribed', {'session_id': session_id, 'message': 'Subscribed to audio stream'})
 
@@ -2644,21 +3878,22 @@ def handle_audio_unsubscribe(data):
     global audio_streamer
     if audio_streamer:
         session_id = data.get('session_id', 'unknown')
-        logger.info(f"Client {request.sid} unsubscribing from audio for session {session_id}")
+        logger.info("Client %s unsubscribing from audio for session %s", request.sid, session_id)
         audio_streamer.unsubscribe_client(request.sid)
     emit('audio:unsubscribed', {'message': 'Unsubscribed from audio stream'})
 
 
-if __name__ == '__main__':
-    logger.info("Starting Jiomosa Renderer Service with WebSocket Streaming")
-    logger.info(f"Selenium: {SELENIUM_HOST}:{SELENIUM_PORT}")
-    logger.info(f"Session Timeout: {SESSION_TIMEOUT} seconds")
-    logger.info(f"Frame Capture Interval: {FRAME_CAPTURE_INTERVAL} seconds")
-    logger.info(f"KaiOS Client Dir: {KAIOS_CLIENT_DIR}")
-    logger.info("WebSocket: Socket.IO enabled on ws://0.0.0.0:5000/socket.io/")
+def start_services():
+    """Create the WebSocket/audio handlers and start the background threads
+    
+    Called from __main__, or from gunicorn's post_worker_init hook (gunicorn.conf.py).
+    """
+    global ws_handler, audio_streamer
     
     # Initialize WebSocket handler
-    ws_handler = WebSocketHandler(socketio, active_sessions)
+    ws_handler = WebSocketHandler(socketio, active_sessions, offload=run_blocking)
+    if ASYNC_MODE == 'gevent':
+        get_hub().threadpool.maxsize = ENCODE_THREADS
     logger.info("WebSocket handler initialized")
     
     # Initialize Audio streamer
@@ -2670,11 +3905,34 @@ if __name__ == '__main__':
     cleanup_thread.start()
     logger.info("Session cleanup thread started")
     
+    # Start frame capture scheduler
+    capture_thread = threading.Thread(target=run_capture_scheduler, daemon=True)
+    capture_thread.start()
+    
     # Start frame streaming thread
     streaming_thread = threading.Thread(target=stream_frames_to_clients, daemon=True)
     streaming_thread.start()
     logger.info("Frame streaming thread started")
+
+
+if __name__ == '__main__':
+    logger.info("Starting Jiomosa Renderer Service with WebSocket Streaming")
+    logger.info("Selenium: %s:%s", SELENIUM_HOST, SELENIUM_PORT)
+    logger.info("Session Timeout: %s seconds", SESSION_TIMEOUT)
+    logger.info("Frame Capture Interval: %s seconds", FRAME_CAPTURE_INTERVAL)
+    logger.info("KaiOS Client Dir: %s", KAIOS_CLIENT_DIR)
+    logger.info("WebSocket: Socket.IO enabled on ws://0.0.0.0:5000/socket.io/ (async mode: %s)", ASYNC_MODE)
+    
+    start_services()
     
     # Debug mode disabled for security - use environment variable to enable if needed
     debug_mode = os.getenv('FLASK_DEBUG', 'false').lower() == 'true'
-    socketio.run(app, host='0.0.0.0', port=5000, debug=debug_mode, allow_unsafe_werkzeug=True)
+    # Under gevent this serves through gevent's pywsgi with the gevent-websocket
+    # handler; Werkzeug's dev server is only the fallback in threading mode, and
+    # only that mode understands allow_unsafe_werkzeug (gevent would treat the
+    # extra keyword as an SSL option)
+    run_options = {'allow_unsafe_werkzeug': True} if ASYNC_MODE == 'threading' else {}
+    if ASYNC_MODE == 'threading' and not debug_mode:
+        logger.warning("Serving with the Werkzeug development server; for production use "
+                       "gevent mode or run: gunicorn -c gunicorn.conf.py app:app")
+    socketio.run(app, host='0.0.0.0', port=5000, debug=debug_mode, **run_options)
@@ -5,12 +5,27 @@ Captures audio from browser sessions and streams to clients via WebSocket
 import logging
 import time
 import threading
-import base64
+import math
+from functools import lru_cache
 import struct
+from collections import deque
 from io import BytesIO
 
 logger = logging.getLogger(__name__)
 
+# Try to import NumPy for vectorized tone synthesis (falls back to a per-sample loop)
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+
+@lru_cache(maxsize=8)
+def silence(num_samples):
+    """Zeroed 16-bit PCM of num_samples; immutable, so one object is shared by every session"""
+    return bytes(num_samples * 2)  # 16-bit samples = 2 bytes each
+
 
 class AudioChunk:
     """Represents an audio chunk for streaming"""
@@ -41,12 +56,15 @@ class AudioCapture:
         self.driver = driver
         self.capturing = False
         self.capture_thread = None
-        self.audio_buffer = []
-        self.buffer_lock = threading.Lock()
         self.max_buffer_size = 100  # Keep last 100 chunks
+        # One producer (_capture_loop) and one consumer (the streamer): deque append
+        # and popleft are atomic, so the buffer needs no lock. The oldest chunk
+        # drops off when full.
+        self.audio_buffer = deque(maxlen=self.max_buffer_size)
         self.sample_rate = 44100
         self.channels = 1
         self.bits_per_sample = 16
+        self.tone_phase = 0  # Samples generated so far, so consecutive tone chunks join smoothly
         
     def start_capture(self):
         """Start audio capture"""
@@ -54,7 +72,7 @@ class AudioCapture:
             return
             
         self.capturing = True
-        logger.info(f"[Audio] Starting capture for session {self.session_id}")
+        logger.info("[Audio] Starting capture for session %s", self.session_id)
         
         # For now, we'll generate silence or test tone
         # Real implementation would use PulseAudio or CDP
@@ -64,7 +82,7 @@ class AudioCapture:
     def stop_capture(self):
         """Stop audio capture"""
         self.capturing = False
-        logger.info(f"[Audio] Stopping capture for session {self.session_id}")
+        logger.info("[Audio] Stopping capture for session %s", self.session_id)
         
     def _capture_loop(self):
         """Main capture loop"""
@@ -84,47 +102,61 @@ class AudioCapture:
                     bits_per_sample=self.bits_per_sample
                 )
                 
-                with self.buffer_lock:
-                    self.audio_buffer.append(chunk)
-                    # Trim buffer if too large
-                    while len(self.audio_buffer) > self.max_buffer_size:
-                        self.audio_buffer.pop(0)
+                self.audio_buffer.append(chunk)
                         
                 time.sleep(chunk_duration)
                 
             except Exception as e:
-                logger.error(f"[Audio] Capture error: {e}")
+                logger.error("[Audio] Capture error: %s", e)
                 time.sleep(0.1)
                 
     def _generate_silence(self, num_samples):
         """Generate silence (all zeros)"""
-        return bytes(num_samples * 2)  # 16-bit samples = 2 bytes each
+        return silence(num_samples)
         
     def _generate_test_tone(self, num_samples, frequency=440):
-        """Generate a test tone (sine wave)"""
-        import math
+        """Generate a test tone (sine wave), continuing the previous chunk's phase"""
+        start = self.tone_phase
+        self.tone_phase += num_samples
+        step = 2 * math.pi * frequency / self.sample_rate
+        if NUMPY_AVAILABLE:
+            samples = 32767 * 0.5 * np.sin(step * np.arange(start, start + num_samples))
+            # Signed 16-bit little-endian
+            return samples.astype('<i2').tobytes()
+        
         data = bytearray()
-        for i in range(num_samples):
+        for i in range(start, start + num_samples):
             # Generate sine wave sample
-            t = i / self.sample_rate
-            value = int(32767 * 0.5 * math.sin(2 * math.pi * frequency * t))
+            value = int(32767 * 0.5 * math.sin(step * i))
             # Pack as signed 16-bit little-endian
             data.extend(struct.pack('<h', value))
         return bytes(data)
         
     def get_chunk(self):
         """Get next audio chunk from buffer"""
-        with self.buffer_lock:
-            if self.audio_buffer:
-                return self.audio_buffer.pop(0)
-        return None
+        try:
+            return self.audio_buffer.popleft()
+        except IndexError:
+            return None
         
     def get_all_chunks(self):
         """Get all available audio chunks"""
-        with self.buffer_lock:
-            chunks = self.audio_buffer[:]
-            self.audio_buffer.clear()
+        # Pop one at a time: a chunk appended mid-drain is either taken or left for next time
+        chunks = []
+        try:
+            while True:
+                chunks.append(self.audio_buffer.popleft())
+        except IndexError:
             return chunks
+    
+    def drain_bytes(self):
+        """Pop all buffered chunks as one PCM buffer (b'' when nothing is buffered)"""
+        return b''.join([chunk.data for chunk in self.get_all_chunks()])
+
+
+def audio_room(session_id):
+    """Socket.IO room holding every client that listens to a session's audio"""
+    return f'audio:{session_id}'
 
 
 class AudioStreamer:
@@ -164,9 +196,13 @@ class AudioStreamer:
             driver = session.driver if session else None
             self.audio_captures[session_id] = AudioCapture(session_id, driver)
             self.audio_captures[session_id].start_capture()
-            
+        
+        previous = self.client_audio_sessions.get(client_id)
+        if previous is not None and previous != session_id:
+            self.socketio.server.leave_room(client_id, audio_room(previous))
         self.client_audio_sessions[client_id] = session_id
-        logger.info(f"[AudioStreamer] Client {client_id} subscribed to audio from session {session_id}")
+        self.socketio.server.enter_room(client_id, audio_room(session_id))
+        logger.info("[AudioStreamer] Client %s subscribed to audio from session %s", client_id, session_id)
         
     def unsubscribe_client(self, client_id):
         """Unsubscribe a client from audio"""
@@ -174,6 +210,7 @@ class AudioStreamer:
         
         # Check if any other clients are listening to this session
         if session_id:
+            self.socketio.server.leave_room(client_id, audio_room(session_id))
             other_clients = [c for c, s in self.client_audio_sessions.items() if s == session_id]
             if not other_clients:
                 # No more clients, stop capture
@@ -181,7 +218,7 @@ class AudioStreamer:
                     self.audio_captures[session_id].stop_capture()
                     del self.audio_captures[session_id]
                     
-        logger.info(f"[AudioStreamer] Client {client_id} unsubscribed from audio")
+        logger.info("[AudioStreamer] Client %s unsubscribed from audio", client_id)
         
     def _stream_loop(self):
         """Main streaming loop - sends audio chunks to subscribed clients"""
@@ -189,39 +226,39 @@ class AudioStreamer:
             try:
                 # For each session with audio capture
                 for session_id, capture in list(self.audio_captures.items()):
-                    chunks = capture.get_all_chunks()
-                    if not chunks:
+                    # Buffered chunks joined into a single payload
+                    combined_data = capture.drain_bytes()
+                    if not combined_data:
                         continue
                         
-                    # Find clients subscribed to this session
-                    clients = [c for c, s in self.client_audio_sessions.items() if s == session_id]
-                    if not clients:
+                    # Skip the encode when nobody is listening
+                    if session_id not in self.client_audio_sessions.values():
                         continue
-                        
-                    # Combine chunks into a single payload
-                    combined_data = b''.join(chunk.data for chunk in chunks)
                     
-                    # Encode for transmission
+                    # Silence suppression: all-zero PCM isn't sent at all
+                    if combined_data.count(0) == len(combined_data):
+                        continue
+                        
+                    # Raw PCM bytes go out as a binary attachment, no base64
                     audio_payload = {
                         'session_id': session_id,
-                        'data': base64.b64encode(combined_data).decode('utf-8'),
+                        'data': combined_data,
                         'sample_rate': capture.sample_rate,
                         'channels': capture.channels,
                         'format': 'pcm16',
                         'timestamp': time.time()
                     }
                     
-                    # Send to each client
-                    for client_id in clients:
-                        try:
-                            self.socketio.emit('audio', audio_payload, room=client_id)
-                        except Exception as e:
-                            logger.error(f"[AudioStreamer] Error sending to client {client_id}: {e}")
+                    # One emit; Socket.IO fans it out to every listener in the room
+                    try:
+                        self.socketio.emit('audio', audio_payload, room=audio_room(session_id))
+                    except Exception as e:
+                        logger.error("[AudioStreamer] Error sending audio for session %s: %s", session_id, e)
                             
                 time.sleep(0.05)  # 50ms interval for low latency
                 
             except Exception as e:
-                logger.error(f"[AudioStreamer] Stream loop error: {e}")
+                logger.error("[AudioStreamer] Stream loop error: %s", e)
                 time.sleep(0.1)
 
 
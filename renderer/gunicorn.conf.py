@@ -0,0 +1,18 @@
+# Gunicorn settings for the renderer: gunicorn -c gunicorn.conf.py app:app
+#
+# Browser sessions, subscriptions and the capture scheduler live in process
+# memory, so there is exactly one worker. It is a gevent worker with WebSocket
+# support, giving the same concurrency as `python app.py` in gevent mode.
+
+bind = '0.0.0.0:5000'
+workers = 1
+worker_class = 'geventwebsocket.gunicorn.workers.GeventWebSocketWorker'
+# Session creation and page loads can wait on Selenium for a while
+timeout = 120
+graceful_timeout = 30
+
+
+def post_worker_init(worker):
+    """Start the handlers and background threads inside the worker"""
+    import app
+    app.start_services()
@@ -4,22 +4,171 @@ Handles bidirectional communication between client and browser session
 """
 import logging
 import time
+import struct
+import threading
+from collections import deque
 from io import BytesIO
-from PIL import Image
+from PIL import Image, ImageChops
 import base64
 
 logger = logging.getLogger(__name__)
 
+# Try to load libjpeg-turbo through PyTurboJPEG for SIMD JPEG coding (falls back to Pillow)
+try:
+    import numpy as np
+    from turbojpeg import TurboJPEG, TJPF_RGB, TJSAMP_420, TJSAMP_GRAY
+    turbo_jpeg = TurboJPEG()
+    TURBOJPEG_AVAILABLE = True
+except Exception:  # ImportError, or OSError when libturbojpeg itself can't be loaded
+    TURBOJPEG_AVAILABLE = False
+
+# Binary frame batches: each JPEG is prefixed with its length (big-endian uint32)
+FRAME_LENGTH = struct.Struct('>I')
+# Frames held per client between flushes. Clients only display the newest,
+# so a slow client keeps one pending frame (latest wins) instead of a backlog.
+FRAME_PENDING_MAX = 1
+
+# Dirty-rect deltas: MCU-aligned rects, a full keyframe every DELTA_KEYFRAME_INTERVAL
+# deltas or whenever the rect covers more than DELTA_MAX_DIRTY_RATIO of the frame
+MCU_SIZE = 16
+DELTA_KEYFRAME_INTERVAL = 30
+DELTA_MAX_DIRTY_RATIO = 0.5
+
+# Backpressure defaults (overridable per client through adaptive:toggle)
+BACKPRESSURE_DEFAULTS = {
+    'high_water': 2,  # Unacked frames above which quality is halved
+    'drop_at': 4,  # Unacked frames above which new frames are dropped
+    'fast_rtt_ms': 50,  # Ack RTT under which quality may step up
+}
+QUALITY_FLOOR = 20
+QUALITY_CEILING = 90
+RTT_EWMA_ALPHA = 0.2
+
+# Per-thread scratch buffer for Pillow encodes. It is rewound rather than
+# truncated, so its allocation is kept across frames and only grows.
+_encode_scratch = threading.local()
+
+
+def _save_jpeg(image, quality):
+    """Save a PIL image as JPEG into this thread's scratch buffer and copy it out"""
+    buffer = getattr(_encode_scratch, 'buffer', None)
+    if buffer is None:
+        buffer = _encode_scratch.buffer = BytesIO()
+    buffer.seek(0)
+    image.save(buffer, format='JPEG', quality=quality, optimize=False)
+    with buffer.getbuffer() as view:
+        return bytes(view[:buffer.tell()])
+
+
+def encode_jpeg(frame_data, quality, scale=1.0):
+    """Re-encode an image as JPEG at the given quality, shrunk by scale when below 1
+    
+    Pure CPU work with no shared state, so it can run on a native worker thread.
+    """
+    if scale < 1.0:
+        img = Image.open(BytesIO(frame_data))
+        size = (max(1, int(img.width * scale)), max(1, int(img.height * scale)))
+        img.draft('RGB', size)  # Let a JPEG decode at reduced DCT size where it can
+        img = img.convert('RGB')
+        img.thumbnail(size, Image.Resampling.BILINEAR)
+        return encode_image_jpeg(img, quality)
+    
+    if TURBOJPEG_AVAILABLE:
+        if frame_data[:3] == b'\xff\xd8\xff':
+            # JPEG -> JPEG: stay in YUV planes so neither side does colour conversion
+            width, height, subsample, _ = turbo_jpeg.decode_header(frame_data)
+            if subsample != TJSAMP_GRAY:
+                planes, _ = turbo_jpeg.decode_to_yuv(frame_data)
+                return turbo_jpeg.encode_from_yuv(
+                    planes, height, width, quality=quality, jpeg_subsample=subsample
+                )
+            pixels = turbo_jpeg.decode(frame_data, pixel_format=TJPF_RGB)
+        else:
+            pixels = np.asarray(Image.open(BytesIO(frame_data)).convert('RGB'))
+        return turbo_jpeg.encode(
+            np.ascontiguousarray(pixels), quality=quality,
+            pixel_format=TJPF_RGB, jpeg_subsample=TJSAMP_420
+        )
+    
+    # Convert PNG to JPEG with adjustable quality
+    # Use fastest PIL settings for better FPS
+    img = Image.open(BytesIO(frame_data))
+    
+    # Convert to RGB if necessary (some screenshots might be RGBA)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    
+    # Optimize size with quality - disable optimize flag for speed
+    return _save_jpeg(img, quality)
+
+
+def encode_image_jpeg(image, quality):
+    """JPEG-encode RGB pixels from decode_rgb (used for dirty-rect patches)"""
+    if TURBOJPEG_AVAILABLE:
+        return turbo_jpeg.encode(
+            np.ascontiguousarray(image), quality=quality,
+            pixel_format=TJPF_RGB, jpeg_subsample=TJSAMP_420
+        )
+    return _save_jpeg(image, quality)
+
+
+def decode_rgb(frame_data):
+    """Decode a frame to RGB pixels
+    
+    With TurboJPEG this is an (h, w, 3) uint8 array, so diffs and crops stay
+    in NumPy; otherwise it is a PIL image.
+    """
+    if TURBOJPEG_AVAILABLE:
+        if frame_data[:3] == b'\xff\xd8\xff':
+            return turbo_jpeg.decode(frame_data, pixel_format=TJPF_RGB)
+        return np.asarray(Image.open(BytesIO(frame_data)).convert('RGB'))
+    return Image.open(BytesIO(frame_data)).convert('RGB')
+
+
+def pixel_size(image):
+    """(width, height) of pixels from decode_rgb"""
+    if TURBOJPEG_AVAILABLE:
+        return image.shape[1], image.shape[0]
+    return image.size
+
+
+def changed_bbox(before, after):
+    """(left, top, right, bottom) of the pixels that differ, or None"""
+    if TURBOJPEG_AVAILABLE:
+        # One vectorised compare plus row/column reductions; no difference image
+        mask = (before != after).any(axis=2)
+        rows = np.flatnonzero(mask.any(axis=1))
+        if not rows.size:
+            return None
+        cols = np.flatnonzero(mask.any(axis=0))
+        return int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1
+    return ImageChops.difference(before, after).getbbox()
+
+
+def crop_pixels(image, left, top, right, bottom):
+    """Crop pixels from decode_rgb (a view when they are a NumPy array)"""
+    if TURBOJPEG_AVAILABLE:
+        return image[top:bottom, left:right]
+    return image.crop((left, top, right, bottom))
+
+
+def run_inline(fn, *args):
+    """Default offload: just call the function"""
+    return fn(*args)
+
 
 class BandwidthMonitor:
     """Monitor bandwidth and adapt quality accordingly"""
     
     def __init__(self, client_id):
         self.client_id = client_id
-        self.frame_times = []  # (timestamp, frame_size) tuples
         self.max_history = 30  # Keep last 30 frames
-        self.last_adjustment = time.time()
-        self.adjustment_interval = 5  # Adjust every 5 seconds
+        self.frame_times = deque(maxlen=self.max_history)  # (monotonic_ns, frame_size) tuples
+        self.total_bytes = 0  # Sum of the frame sizes in frame_times
+        self.last_adjustment = time.monotonic_ns()
+        self.adjustment_interval = 5 * 1_000_000_000  # Adjust every 5 seconds (ns)
+        self.frames_since_check = 0  # Frames recorded since should_adjust last read the clock
+        self.check_every = 30  # Read the clock at most once per this many frames
         
         # Quality tiers (Mbps thresholds)
         self.fast_threshold = 5.0  # >5 Mbps
@@ -28,11 +177,12 @@ class BandwidthMonitor:
     
     def record_frame(self, frame_size_bytes):
         """Record frame transmission"""
-        self.frame_times.append((time.time(), frame_size_bytes))
-        
-        # Keep only recent history
-        if len(self.frame_times) > self.max_history:
-            self.frame_times.pop(0)
+        # Keep only recent history: the deque drops the oldest entry, so take it off the total first
+        if len(self.frame_times) == self.max_history:
+            self.total_bytes -= self.frame_times[0][1]
+        self.frame_times.append((time.monotonic_ns(), frame_size_bytes))
+        self.total_bytes += frame_size_bytes
+        self.frames_since_check += 1
     
     def get_bandwidth_mbps(self):
         """Calculate current bandwidth in Mbps"""
@@ -42,22 +192,17 @@ class BandwidthMonitor:
         try:
             oldest_time, _ = self.frame_times[0]
             newest_time, _ = self.frame_times[-1]
-            time_delta = newest_time - oldest_time
+            time_delta = newest_time - oldest_time  # ns, never negative on the monotonic clock
             
-            if time_delta < 0.1:  # Need at least 100ms of data
+            if time_delta < 100_000_000:  # Need at least 100ms of data
                 return 5.0
             
-            # Calculate total bytes transferred
-            total_bytes = sum(size for _, size in self.frame_times)
-            
-            # Convert to bits and divide by time in seconds
-            total_bits = total_bytes * 8
-            bandwidth_bps = total_bits / time_delta
-            bandwidth_mbps = bandwidth_bps / 1_000_000
+            # bits per ns * 1000 = Mbps, with integer math up to the final division
+            bandwidth_mbps = self.total_bytes * 8_000 / time_delta
             
             return max(0.5, min(50.0, bandwidth_mbps))  # Clamp 0.5-50 Mbps
         except Exception as e:
-            logger.error(f"Error calculating bandwidth: {e}")
+            logger.error("Error calculating bandwidth: %s", e)
             return 5.0
     
     def get_recommended_quality(self):
@@ -71,6 +216,20 @@ class BandwidthMonitor:
         else:
             return 50  # Lower quality for slow connections
     
+    def get_recommended_scale(self):
+        """Get recommended frame scale based on bandwidth
+        
+        Below ~60 quality, fewer pixels save more bytes than a lower quality does.
+        """
+        bandwidth = self.get_bandwidth_mbps()
+        
+        if bandwidth > self.normal_threshold:
+            return 1.0  # Full size for fast and normal connections
+        elif bandwidth > self.slow_threshold:
+            return 0.75
+        else:
+            return 0.5  # Half size (a quarter of the pixels) for the slowest links
+    
     def get_recommended_fps(self):
         """Get recommended FPS based on bandwidth"""
         bandwidth = self.get_bandwidth_mbps()
@@ -85,7 +244,11 @@ class BandwidthMonitor:
     
     def should_adjust(self):
         """Check if it's time to adjust quality"""
-        now = time.time()
+        # Adjustments are seconds apart; counting frames is cheaper than reading the clock each time
+        if self.frames_since_check < self.check_every:
+            return False
+        self.frames_since_check = 0
+        now = time.monotonic_ns()
         if now - self.last_adjustment >= self.adjustment_interval:
             self.last_adjustment = now
             return True
@@ -93,181 +256,398 @@ class BandwidthMonitor:
 
 
 class FrameDelta:
-    """Detect and encode only changed pixels between frames"""
+    """Track the changed region between consecutive frames of a session
     
-    def __init__(self, width=1920, height=1080):
-        self.last_frame = None
-        self.width = width
-        self.height = height
-        self.threshold = 20  # Pixel difference threshold
+    The dirty rectangle is the bounding box of changed pixels, widened to the
+    16px JPEG MCU grid so patched edges line up with the full frame's blocks.
+    It is computed once per new frame and shared by every delta client.
+    """
     
-    def has_changed(self, new_frame_data):
-        """Check if frame has significant changes"""
-        if self.last_frame is None:
-            return True
+    def __init__(self):
+        self.previous = None  # Frame bytes the current rect is relative to (identity only)
+        self.current = None  # Latest frame bytes (the session holds it as last_frame anyway)
+        self.current_image = None  # Decoded pixels of current (see decode_rgb)
+        self.rect = None  # (x, y, w, h) changed between previous and current
+        self.region = None  # Cropped RGB pixels for rect
+    
+    def update(self, frame_data):
+        """Advance to frame_data (a no-op when it is the frame already tracked)"""
+        if frame_data is self.current:
+            return
+        image = decode_rgb(frame_data)
+        previous_image = self.current_image
+        self.previous, self.current, self.current_image = self.current, frame_data, image
+        self.rect = self.region = None
+        width, height = pixel_size(image)
+        if previous_image is None or pixel_size(previous_image) != (width, height):
+            return
         
-        try:
-            # Quick comparison - sample every 10th pixel
-            if len(new_frame_data) != len(self.last_frame):
-                return True
-            
-            sample_rate = 10
-            for i in range(0, len(new_frame_data), sample_rate):
-                if abs(new_frame_data[i] - self.last_frame[i]) > self.threshold:
-                    return True
-            
-            return False
-        except Exception as e:
-            logger.error(f"Error comparing frames: {e}")
-            return True
+        bbox = changed_bbox(previous_image, image)
+        if bbox is None:
+            return
+        left, top, right, bottom = bbox
+        left, top = left - left % MCU_SIZE, top - top % MCU_SIZE
+        right = min(width, right + (-right) % MCU_SIZE)
+        bottom = min(height, bottom + (-bottom) % MCU_SIZE)
+        self.rect = (left, top, right - left, bottom - top)
+        self.region = crop_pixels(image, left, top, right, bottom)
+    
+    def dirty_ratio(self):
+        """Fraction of the frame covered by the dirty rect"""
+        if self.rect is None:
+            return 1.0
+        width, height = pixel_size(self.current_image)
+        return (self.rect[2] * self.rect[3]) / float(width * height)
+
+
+class ClientState:
+    """Everything tracked for one subscribed framebuffer client
+    
+    One object per client, so the per-frame path does a single dict lookup
+    instead of one per setting.
+    """
+    
+    __slots__ = (
+        'session_id', 'session', 'quality', 'scale', 'fps', 'adaptive', 'monitor',
+        'binary_batch', 'delta', 'inflight', 'rtt_ewma', 'acked', 'backpressure',
+        'delta_base', 'deltas_since_key'
+    )
     
-    def get_delta(self, new_frame_data):
-        """Get compressed delta of changed pixels"""
-        self.last_frame = new_frame_data
-        return new_frame_data  # For now, return full frame (can optimize later)
+    def __init__(self, client_id, session_id, session, binary_batch=False, delta=False):
+        self.session_id = session_id
+        self.session = session  # Session object, saves the active_sessions lookup on input
+        self.quality = 75  # Start with moderate quality for better FPS
+        self.scale = 1.0  # Downscale factor for base64 'frame' events on slow links
+        self.fps = 30  # Start with 30 FPS for responsive streaming
+        self.adaptive = True  # Enable by default
+        self.monitor = BandwidthMonitor(client_id)
+        self.binary_batch = binary_batch  # Opt-in to binary 'frames_batch' messages
+        self.delta = delta  # Opt-in to dirty-rect 'frame:delta' patches
+        self.inflight = 0  # Frames emitted but not yet acknowledged
+        self.rtt_ewma = None  # Smoothed ack round-trip time (seconds)
+        self.acked = False  # Client acknowledges frames; only then it gets backpressure
+        self.backpressure = BACKPRESSURE_DEFAULTS
+        self.delta_base = None  # Frame the client currently displays
+        self.deltas_since_key = 0  # Patches sent since the last full frame
 
 
 class WebSocketHandler:
     """Manages WebSocket communication for frame streaming"""
     
-    def __init__(self, socketio, active_sessions):
+    def __init__(self, socketio, active_sessions, offload=None):
         self.socketio = socketio
         self.active_sessions = active_sessions
+        self.offload = offload or run_inline  # Runs CPU-bound frame encodes
         self.frame_deltas = {}  # Per-session frame delta trackers
-        self.client_quality = {}  # Per-client quality settings
-        self.client_fps = {}  # Per-client FPS settings
+        self.clients = {}  # Per-client ClientState
         self.client_sessions = {}  # Track which session each client is subscribed to
-        self.bandwidth_monitors = {}  # Per-client bandwidth monitor
-        self.adaptive_mode = {}  # Per-client adaptive mode enabled
+        self.pending_frames = {}  # Per-client bounded slot of JPEGs for the next flush
+        self.flush_scheduled = set()  # Clients with a flush task already queued
+        self.pending_lock = threading.Lock()
     
-    def handle_subscribe(self, client_id, session_id, emit_func):
+    def handle_subscribe(self, client_id, session_id, emit_func, binary_batch=False, delta=False):
         """Handle client subscription to a session"""
         try:
-            # Initialize frame delta tracker
-            if session_id not in self.frame_deltas:
-                self.frame_deltas[session_id] = FrameDelta()
-            
-            self.client_quality[client_id] = 75  # Start with moderate quality for better FPS
-            self.client_fps[client_id] = 30  # Start with 30 FPS for responsive streaming
+            client = self.clients[client_id] = ClientState(
+                client_id, session_id, self.active_sessions.get(session_id), binary_batch, delta
+            )
             self.client_sessions[client_id] = session_id
-            self.bandwidth_monitors[client_id] = BandwidthMonitor(client_id)
-            self.adaptive_mode[client_id] = True  # Enable by default
             
-            logger.info(f"Client {client_id} subscribed to session {session_id} (adaptive mode: ON)")
+            logger.info("Client %s subscribed to session %s (adaptive mode: ON)", client_id, session_id)
             emit_func('subscribe:response', {
                 'session_id': session_id,
-                'fps': self.client_fps[client_id],
-                'quality': self.client_quality[client_id],
+                'fps': client.fps,
+                'quality': client.quality,
                 'adaptive_mode': True
             })
             
         except Exception as e:
-            logger.error(f"Error subscribing: {e}")
+            logger.error("Error subscribing: %s", e)
             emit_func('error', {'message': str(e)})
     
     def handle_unsubscribe(self, client_id):
         """Handle client unsubscription"""
         try:
-            session_id = self.client_sessions.get(client_id)
-            
-            if client_id in self.client_quality:
-                del self.client_quality[client_id]
-            
-            if client_id in self.client_fps:
-                del self.client_fps[client_id]
-            
-            if client_id in self.client_sessions:
-                del self.client_sessions[client_id]
-            
-            if client_id in self.bandwidth_monitors:
-                del self.bandwidth_monitors[client_id]
+            session_id = self.client_sessions.pop(client_id, None)
+            state = self.clients.pop(client_id, None)
+            with self.pending_lock:
+                self.pending_frames.pop(client_id, None)
+            # The tracker keeps a decoded frame alive; drop it with the session's last delta client
+            if not any(client.delta and client.session_id == session_id for client in self.clients.values()):
+                self.frame_deltas.pop(session_id, None)
+            # Last WebSocket client gone: hand capture quality back to the session's adaptive setting
+            if session_id is not None and session_id not in self.client_sessions.values():
+                session = self.active_sessions.get(session_id) or (state.session if state is not None else None)
+                if session is not None:
+                    session.set_capture_quality(None)
             
-            if client_id in self.adaptive_mode:
-                del self.adaptive_mode[client_id]
-            
-            logger.info(f"Client {client_id} unsubscribed from session {session_id}")
+            logger.info("Client %s unsubscribed from session %s", client_id, session_id)
             
         except Exception as e:
-            logger.error(f"Error unsubscribing: {e}")
+            logger.error("Error unsubscribing: %s", e)
     
     def get_session_id_for_client(self, client_id):
         """Get the session ID for a client"""
         return self.client_sessions.get(client_id)
     
+    def get_quality(self, client_id):
+        """JPEG quality currently used for a client"""
+        client = self.clients.get(client_id)
+        return client.quality if client is not None else 75
+    
+    def capture_quality_for(self, session_id):
+        """The JPEG quality shared by every client of a session, or None if they differ
+        
+        Capturing at this quality lets every client take the screenshot bytes as-is.
+        """
+        qualities = {client.quality for client in self.clients.values() if client.session_id == session_id}
+        return qualities.pop() if len(qualities) == 1 else None
+    
+    def should_send_frame(self, client_id):
+        """False when too many frames to this client are still unacknowledged"""
+        client = self.clients.get(client_id)
+        if client is None or not client.acked:
+            return True
+        return client.inflight <= client.backpressure['drop_at']
+    
+    def frame_ack_callback(self, client_id):
+        """Count a frame as in flight and return the Socket.IO ack callback for it"""
+        client = self.clients.get(client_id)
+        if client is not None:
+            client.inflight += 1
+        sent_at = time.monotonic()
+        return lambda *args: self.on_frame_ack(client_id, sent_at)
+    
+    def on_frame_ack(self, client_id, sent_at):
+        """Update in-flight count and RTT, then adapt quality to the backlog"""
+        client = self.clients.get(client_id)
+        if client is None:
+            return
+        client.acked = True
+        inflight = client.inflight = max(0, client.inflight - 1)
+        
+        rtt = time.monotonic() - sent_at
+        previous = client.rtt_ewma
+        rtt = client.rtt_ewma = rtt if previous is None else previous + RTT_EWMA_ALPHA * (rtt - previous)
+        
+        if not client.adaptive:
+            return
+        limits = client.backpressure
+        quality = client.quality
+        if inflight > limits['high_water']:
+            new_quality = max(QUALITY_FLOOR, quality // 2)
+        elif inflight == 0 and rtt * 1000 < limits['fast_rtt_ms']:
+            new_quality = min(QUALITY_CEILING, quality + 5)
+        else:
+            return
+        if new_quality != quality:
+            logger.debug(
+                "Client %s backlog %s, RTT %.1f ms | Quality: %s→%s",
+                client_id, inflight, rtt * 1000, quality, new_quality
+            )
+            client.quality = new_quality
+    
     def record_frame_sent(self, client_id, frame_size_bytes):
         """Record frame transmission for bandwidth calculation"""
-        if client_id in self.bandwidth_monitors:
-            monitor = self.bandwidth_monitors[client_id]
-            monitor.record_frame(frame_size_bytes)
+        client = self.clients.get(client_id)
+        if client is None:
+            return
+        monitor = client.monitor
+        monitor.record_frame(frame_size_bytes)
+        
+        # Clients that acknowledge frames are adapted by on_frame_ack instead;
+        # the bandwidth timer remains the fallback for the rest
+        if client.acked:
+            return
+        
+        # Check if we should adapt quality
+        if client.adaptive and monitor.should_adjust():
+            new_quality = monitor.get_recommended_quality()
+            new_fps = monitor.get_recommended_fps()
+            client.scale = monitor.get_recommended_scale()
             
-            # Check if we should adapt quality
-            if self.adaptive_mode.get(client_id, False) and monitor.should_adjust():
-                new_quality = monitor.get_recommended_quality()
-                new_fps = monitor.get_recommended_fps()
-                
-                old_quality = self.client_quality.get(client_id, 85)
-                old_fps = self.client_fps.get(client_id, 30)
-                
-                # Only log if changed
-                if new_quality != old_quality or new_fps != old_fps:
-                    bandwidth = monitor.get_bandwidth_mbps()
-                    logger.info(
-                        f"Client {client_id} bandwidth: {bandwidth:.2f} Mbps | "
-                        f"Quality: {old_quality}→{new_quality}, FPS: {old_fps}→{new_fps}"
-                    )
-                    self.client_quality[client_id] = new_quality
-                    self.client_fps[client_id] = new_fps
+            old_quality = client.quality
+            old_fps = client.fps
+            
+            # Only log if changed
+            if new_quality != old_quality or new_fps != old_fps:
+                bandwidth = monitor.get_bandwidth_mbps()
+                logger.info(
+                    "Client %s bandwidth: %.2f Mbps | Quality: %s→%s, FPS: %s→%s",
+                    client_id, bandwidth, old_quality, new_quality, old_fps, new_fps
+                )
+                client.quality = new_quality
+                client.fps = new_fps
     
     def set_quality(self, client_id, quality):
         """Set JPEG quality for a client (disables adaptive mode for this setting)"""
+        client = self.clients.get(client_id)
+        if client is None:
+            return
         quality = max(1, min(100, quality))
-        self.client_quality[client_id] = quality
-        self.adaptive_mode[client_id] = False  # Disable adaptive when manually set
-        logger.info(f"Client {client_id} quality set to {quality} (adaptive mode: OFF)")
+        client.quality = quality
+        client.adaptive = False  # Disable adaptive when manually set
+        client.scale = 1.0
+        logger.info("Client %s quality set to %s (adaptive mode: OFF)", client_id, quality)
     
     def set_fps(self, client_id, fps):
         """Set FPS for a client (disables adaptive mode for this setting)"""
+        client = self.clients.get(client_id)
+        if client is None:
+            return
         fps = max(1, min(60, fps))
-        self.client_fps[client_id] = fps
-        self.adaptive_mode[client_id] = False  # Disable adaptive when manually set
-        logger.info(f"Client {client_id} FPS set to {fps} (adaptive mode: OFF)")
+        client.fps = fps
+        client.adaptive = False  # Disable adaptive when manually set
+        client.scale = 1.0  # No further adjustment would ever restore full size
+        logger.info("Client %s FPS set to %s (adaptive mode: OFF)", client_id, fps)
+    
+    def toggle_adaptive_mode(self, client_id, enabled, thresholds=None):
+        """Toggle adaptive quality mode, optionally overriding backpressure thresholds"""
+        client = self.clients.get(client_id)
+        if client is None:
+            return
+        client.adaptive = enabled
+        if not enabled:
+            client.scale = 1.0  # No further adjustment would ever restore full size
+        if thresholds:
+            limits = dict(client.backpressure)
+            for key in BACKPRESSURE_DEFAULTS:
+                if key in thresholds:
+                    limits[key] = thresholds[key]
+            client.backpressure = limits
+        logger.info("Client %s adaptive mode: %s", client_id, 'ON' if enabled else 'OFF')
     
-    def toggle_adaptive_mode(self, client_id, enabled):
-        """Toggle adaptive quality mode"""
-        self.adaptive_mode[client_id] = enabled
-        logger.info(f"Client {client_id} adaptive mode: {'ON' if enabled else 'OFF'}")
+    def encode_frame_jpeg(self, frame_data, client_id, source_quality=None, cache=None):
+        """Re-encode a frame as JPEG at the client's quality
+        
+        A JPEG already at the client's quality (source_quality) is returned
+        as-is, skipping the decode and encode passes entirely. With a cache
+        dict (one per session per tick), clients sharing a quality share
+        one encode.
+        """
+        quality = self.get_quality(client_id)
+        if quality == source_quality and frame_data[:3] == b'\xff\xd8\xff':
+            return frame_data
+        if cache is None:
+            return self.offload(encode_jpeg, frame_data, quality)
+        jpeg = cache.get(('jpeg', quality))
+        if jpeg is None:
+            jpeg = cache[('jpeg', quality)] = self.offload(encode_jpeg, frame_data, quality)
+        return jpeg
+    
+    def prepare_delta(self, client_id, session_id, frame_data, cache=None):
+        """Decide how a delta client gets this frame
+        
+        Returns ('skip', None) when the client already shows it, ('delta',
+        (rect, jpeg)) for a patch over the client's current frame, or
+        ('full', None) when the caller should send the whole frame.
+        """
+        client = self.clients.get(client_id)
+        if client is None:
+            return 'skip', None
+        base = client.delta_base
+        if base is frame_data:
+            return 'skip', None
+        
+        tracker = self.frame_deltas.setdefault(session_id, FrameDelta())
+        tracker.update(frame_data)
+        client.delta_base = frame_data
+        
+        if (base is None or base is not tracker.previous or tracker.rect is None
+                or client.deltas_since_key >= DELTA_KEYFRAME_INTERVAL
+                or tracker.dirty_ratio() > DELTA_MAX_DIRTY_RATIO):
+            client.deltas_since_key = 0
+            return 'full', None
+        
+        client.deltas_since_key += 1
+        quality = client.quality
+        jpeg = cache.get(('delta', quality)) if cache is not None else None
+        if jpeg is None:
+            jpeg = self.offload(encode_image_jpeg, tracker.region, quality)
+            if cache is not None:
+                cache[('delta', quality)] = jpeg
+        return 'delta', (tracker.rect, jpeg)
     
-    def encode_frame_for_websocket(self, frame_data, client_id):
-        """Encode frame as base64 for WebSocket transmission - optimized for speed"""
+    def queue_frame(self, client_id, jpeg):
+        """Queue a JPEG for the client's next flush, replacing stale frames"""
+        with self.pending_lock:
+            pending = self.pending_frames.get(client_id)
+            if pending is None:
+                pending = self.pending_frames[client_id] = deque(maxlen=FRAME_PENDING_MAX)
+            pending.append(jpeg)
+            if client_id in self.flush_scheduled:
+                return
+            self.flush_scheduled.add(client_id)
+        self.socketio.start_background_task(self._flush_pending, client_id)
+    
+    def _flush_pending(self, client_id):
+        """Send the pending frames for a client as one binary 'frames_batch' message"""
+        with self.pending_lock:
+            self.flush_scheduled.discard(client_id)
+            pending = self.pending_frames.get(client_id)
+            batch = list(pending) if pending else []
+            if pending:
+                pending.clear()
+        if not batch:
+            return
+        
         try:
-            quality = self.client_quality.get(client_id, 75)
-            
-            # Convert PNG to JPEG with adjustable quality
-            # Use fastest PIL settings for better FPS
-            img = Image.open(BytesIO(frame_data))
-            
-            # Convert to RGB if necessary (some screenshots might be RGBA)
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
-            
-            # Optimize size with quality - disable optimize flag for speed
-            buffer = BytesIO()
-            img.save(buffer, format='JPEG', quality=quality, optimize=False)
-            buffer.seek(0)
+            buf = b''.join(FRAME_LENGTH.pack(len(frame)) + frame for frame in batch)
+            self.socketio.emit('frames_batch', buf, to=client_id, callback=self.frame_ack_callback(client_id))
+            self.record_frame_sent(client_id, len(buf))
+        except Exception as e:
+            logger.error("Error flushing frames to client %s: %s", client_id, e)
+    
+    def encode_frame_passthrough(self, jpeg_bytes, client_id, cache=None):
+        """base64 a JPEG that is already at the client's quality, with no decode or re-encode"""
+        key = ('b64', self.get_quality(client_id))
+        encoded = cache.get(key) if cache is not None else None
+        if encoded is None:
+            encoded = base64.b64encode(jpeg_bytes).decode('ascii')
+            if cache is not None:
+                cache[key] = encoded
+        self.record_frame_sent(client_id, len(encoded))
+        return encoded, len(encoded)
+    
+    def encode_frame_for_websocket(self, frame_data, client_id, source_quality=None, cache=None):
+        """Encode frame as base64 for WebSocket transmission - optimized for speed
+        
+        Adaptive clients on slow links get a downscaled frame. Returns
+        (base64, size, scale) where scale is the one this frame was encoded
+        at; the 'frame' event must report it, since recording the frame may
+        already have changed the client's scale for the next one.
+        """
+        try:
+            client = self.clients.get(client_id)
+            scale = client.scale if client is not None else 1.0
+            if scale >= 1.0 and self.get_quality(client_id) == source_quality and frame_data[:3] == b'\xff\xd8\xff':
+                encoded, size = self.encode_frame_passthrough(frame_data, client_id, cache)
+                return encoded, size, scale
             
             # Encode as base64 for WebSocket
-            encoded = base64.b64encode(buffer.getvalue()).decode('utf-8')
+            # The JPEG depends only on quality and scale, so its base64 form can be shared too
+            quality = self.get_quality(client_id)
+            key = ('b64', quality) if scale >= 1.0 else ('b64', quality, scale)
+            encoded = cache.get(key) if cache is not None else None
+            if encoded is None:
+                if scale >= 1.0:
+                    jpeg = self.encode_frame_jpeg(frame_data, client_id, source_quality, cache)
+                else:
+                    jpeg = self.offload(encode_jpeg, frame_data, quality, scale)
+                encoded = base64.b64encode(jpeg).decode('ascii')
+                if cache is not None:
+                    cache[key] = encoded
             
             # Record transmission for bandwidth monitoring
             self.record_frame_sent(client_id, len(encoded))
             
-            return encoded, len(encoded)
+            return encoded, len(encoded), scale
             
         except Exception as e:
-            logger.error(f"Error encoding frame: {e}")
-            return None, 0
+            logger.error("Error encoding frame: %s", e)
+            return None, 0, 1.0
 
 
-def create_websocket_handler(socketio, active_sessions):
+def create_websocket_handler(socketio, active_sessions, offload=None):
     """Factory function to create WebSocket handler"""
-    return WebSocketHandler(socketio, active_sessions)
+    return WebSocketHandler(socketio, active_sessions, offload)
@@ -0,0 +1,19 @@
+"""
+Shared readiness poll for the renderer integration tests
+"""
+import time
+import requests
+
+
+def wait_until_ready(base_url, session_id, timeout=5, interval=0.1):
+    """Poll session info until the loaded page reports a title, instead of sleeping a fixed time
+
+    Raises AssertionError when the session isn't ready within timeout seconds.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        response = requests.get(f"{base_url}/api/session/{session_id}/info", timeout=5)
+        if response.status_code == 200 and (response.json().get('page_info') or {}).get('title'):
+            return
+        time.sleep(interval)
+    raise AssertionError(f"Session {session_id} not ready within {timeout}s")
@@ -4,6 +4,7 @@ Tests for the Jiomosa Android WebApp
 """
 import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
@@ -18,7 +19,7 @@ class TestAndroidWebApp(unittest.TestCase):
         cls.webapp_url = 'http://localhost:9000'
         cls.renderer_url = 'http://localhost:5000'
         
-        # Create session with retries
+        # Create session with retries (one keep-alive connection pool for every test)
         cls.session = requests.Session()
         retry = Retry(
             total=5,
@@ -29,23 +30,42 @@ class TestAndroidWebApp(unittest.TestCase):
         cls.session.mount('http://', adapter)
         cls.session.mount('https://', adapter)
         
-        # Wait for services to be ready
+        # Wait for services to be ready; they start independently, so poll both at once
         print("Waiting for services to be ready...")
-        cls.wait_for_service(cls.webapp_url, 'Android WebApp')
-        cls.wait_for_service(cls.renderer_url, 'Renderer')
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            waits = [
+                pool.submit(cls.wait_for_service, cls.webapp_url, 'Android WebApp'),
+                pool.submit(cls.wait_for_service, cls.renderer_url, 'Renderer')
+            ]
+            for wait in waits:
+                wait.result()
+        cls._apps = None
+    
+    @classmethod
+    def get_apps(cls):
+        """Fetch the apps list once and share it between the read-only app tests"""
+        if cls._apps is None:
+            response = cls.session.get(f"{cls.webapp_url}/api/apps")
+            response.raise_for_status()
+            cls._apps = response.json()
+        return cls._apps
     
     @classmethod
     def wait_for_service(cls, url, name, timeout=60):
         """Wait for a service to become available"""
         start_time = time.time()
+        delay = 0.1  # Back off from 100ms so a running service is seen at once
         while time.time() - start_time < timeout:
             try:
-                response = cls.session.get(f"{url}/health", timeout=5)
+                # HEAD is enough to see the service answer; no body to transfer
+                response = cls.session.head(f"{url}/health", timeout=2)
                 if response.ok:
                     print(f"✓ {name} is ready")
                     return True
-            except Exception as e:
-                time.sleep(2)
+            except Exception:
+                pass
+            time.sleep(delay)
+            delay = min(delay * 1.5, 2.0)
         
         raise Exception(f"{name} did not become ready within {timeout} seconds")
     
@@ -133,8 +153,7 @@ class TestAndroidWebApp(unittest.TestCase):
     
     def test_popular_websites_in_apps_list(self):
         """Test that popular websites are included in the apps list"""
-        response = self.session.get(f"{self.webapp_url}/api/apps")
-        apps = response.json()
+        apps = self.get_apps()
         
         app_names = [app['name'].lower() for app in apps]
         
@@ -148,8 +167,7 @@ class TestAndroidWebApp(unittest.TestCase):
     
     def test_app_categories(self):
         """Test that apps have proper categories"""
-        response = self.session.get(f"{self.webapp_url}/api/apps")
-        apps = response.json()
+        apps = self.get_apps()
         
         categories = set(app['category'] for app in apps)
         expected_categories = ['social', 'media', 'search', 'dev', 'reference']
@@ -4,21 +4,33 @@ Tests the audio streaming functionality
 """
 import pytest
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import time
 import json
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any
 
 # Configuration
 BASE_URL = "http://localhost:8000"
 TIMEOUT = 30
 
+# One keep-alive connection pool shared by every request in this module
+SESSION = requests.Session()
+SESSION.mount('http://', HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=20,
+    max_retries=Retry(total=2, backoff_factor=0.1)
+))
+
 
 def wait_for_service(url: str, timeout: int = 60) -> bool:
     """Wait for service to become available"""
     start_time = time.time()
     while time.time() - start_time < timeout:
         try:
-            response = requests.get(f"{url}/health", timeout=5)
+            response = SESSION.get(f"{url}/health", timeout=5)
             if response.status_code == 200:
                 return True
         except requests.exceptions.RequestException:
@@ -31,7 +43,17 @@ def wait_for_service(url: str, timeout: int = 60) -> bool:
 def ensure_service():
     """Ensure the WebRTC renderer service is running"""
     assert wait_for_service(BASE_URL), f"WebRTC renderer not available at {BASE_URL}"
-    yield
+    yield SESSION
+    _get_info.cache_clear()
+    SESSION.close()
+
+
+@functools.lru_cache(maxsize=1)
+def _get_info() -> Dict[str, Any]:
+    """Fetch /api/info once per run; its payload is static per server process"""
+    response = SESSION.get(f"{BASE_URL}/api/info")
+    response.raise_for_status()
+    return response.json()
 
 
 class TestAudioPipeline:
@@ -39,9 +61,7 @@ class TestAudioPipeline:
     
     def test_audio_config_in_info(self, ensure_service):
         """Test that audio configuration is exposed in /api/info"""
-        response = requests.get(f"{BASE_URL}/api/info")
-        assert response.status_code == 200
-        data = response.json()
+        data = _get_info()
         
         # Check that audio configuration is present
         assert "webrtc" in data
@@ -72,7 +92,7 @@ class TestAudioPipeline:
     def test_session_with_audio_support(self, ensure_service):
         """Test creating a session that supports audio"""
         # Create session
-        response = requests.post(
+        response = SESSION.post(
             f"{BASE_URL}/api/session/create",
             json={"session_id": "test-audio-session"}
         )
@@ -84,7 +104,7 @@ class TestAudioPipeline:
         print(f"✓ Session with audio support created: {data['session_id']}")
         
         # Load a page with audio capability (YouTube as example)
-        response = requests.post(
+        response = SESSION.post(
             f"{BASE_URL}/api/session/test-audio-session/load",
             json={"url": "https://www.example.com"}
         )
@@ -92,18 +112,13 @@ class TestAudioPipeline:
         
         print("✓ URL loaded in audio-enabled session")
         
-        # Allow time for page load
-        time.sleep(2)
-        
         # Cleanup
-        requests.delete(f"{BASE_URL}/api/session/test-audio-session")
+        SESSION.delete(f"{BASE_URL}/api/session/test-audio-session")
         print("✓ Session closed successfully")
     
     def test_video_config_separate_from_audio(self, ensure_service):
         """Test that video and audio configs are separate in info endpoint"""
-        response = requests.get(f"{BASE_URL}/api/info")
-        assert response.status_code == 200
-        data = response.json()
+        data = _get_info()
         
         webrtc_config = data["webrtc"]
         
@@ -141,7 +156,7 @@ class TestAudioSessionLifecycle:
         session_id = "test-audio-lifecycle"
         
         # 1. Create session
-        response = requests.post(
+        response = SESSION.post(
             f"{BASE_URL}/api/session/create",
             json={"session_id": session_id}
         )
@@ -149,29 +164,26 @@ class TestAudioSessionLifecycle:
         print(f"✓ Step 1: Session created")
         
         # 2. Load a URL that could have audio
-        response = requests.post(
+        response = SESSION.post(
             f"{BASE_URL}/api/session/{session_id}/load",
             json={"url": "https://www.example.com"}
         )
         assert response.status_code == 200
         print(f"✓ Step 2: URL loaded")
         
-        # 3. Wait for page to initialize
-        time.sleep(2)
-        
-        # 4. Verify session exists and is active
-        response = requests.get(f"{BASE_URL}/api/sessions")
+        # 3. Verify session exists and is active
+        response = SESSION.get(f"{BASE_URL}/api/sessions")
         data = response.json()
         assert session_id in data["sessions"]["sessions"]
         print(f"✓ Step 3: Session verified active")
         
-        # 5. Close session
-        response = requests.delete(f"{BASE_URL}/api/session/{session_id}")
+        # 4. Close session
+        response = SESSION.delete(f"{BASE_URL}/api/session/{session_id}")
         assert response.status_code == 200
         print(f"✓ Step 4: Session closed")
         
-        # 6. Verify session is closed
-        response = requests.get(f"{BASE_URL}/api/sessions")
+        # 5. Verify session is closed
+        response = SESSION.get(f"{BASE_URL}/api/sessions")
         data = response.json()
         assert session_id not in data["sessions"]["sessions"]
         print(f"✓ Step 5: Session confirmed closed")
@@ -180,18 +192,19 @@ class TestAudioSessionLifecycle:
         """Test multiple concurrent sessions with audio"""
         session_ids = [f"test-audio-multi-{i}" for i in range(3)]
         
-        # Create multiple sessions
-        for session_id in session_ids:
-            response = requests.post(
-                f"{BASE_URL}/api/session/create",
-                json={"session_id": session_id}
-            )
+        # Create multiple sessions in parallel; each create waits on a browser start
+        with ThreadPoolExecutor(max_workers=len(session_ids)) as pool:
+            responses = list(pool.map(
+                lambda sid: SESSION.post(f"{BASE_URL}/api/session/create", json={"session_id": sid}),
+                session_ids
+            ))
+        for response in responses:
             assert response.status_code == 200
         
         print(f"✓ Created {len(session_ids)} concurrent audio sessions")
         
         # Verify all exist
-        response = requests.get(f"{BASE_URL}/api/sessions")
+        response = SESSION.get(f"{BASE_URL}/api/sessions")
         data = response.json()
         sessions = data["sessions"]["sessions"]
         for session_id in session_ids:
@@ -200,8 +213,8 @@ class TestAudioSessionLifecycle:
         print("✓ All audio sessions are active")
         
         # Cleanup all
-        for session_id in session_ids:
-            requests.delete(f"{BASE_URL}/api/session/{session_id}")
+        with ThreadPoolExecutor(max_workers=len(session_ids)) as pool:
+            list(pool.map(lambda sid: SESSION.delete(f"{BASE_URL}/api/session/{sid}"), session_ids))
         
         print("✓ All audio sessions closed")
 
@@ -11,6 +11,7 @@ import subprocess
 import statistics
 import sys
 import logging
+from readiness import wait_until_ready
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -52,7 +53,7 @@ def test_adaptive_quality_settings():
             return False
         
         logger.info("✓ Website loaded")
-        time.sleep(2)
+        wait_until_ready(RENDERER_URL, session_id)
         
         # Get initial frame
         response = requests.get(f'{RENDERER_URL}/api/session/{session_id}/frame')
@@ -215,7 +216,7 @@ def test_streaming_latency():
             json={'url': 'https://example.com'},
             timeout=30
         )
-        time.sleep(2)
+        wait_until_ready(RENDERER_URL, session_id)
         
         # Measure frame capture latency
         latencies = []
@@ -7,6 +7,7 @@ import time
 import sys
 import base64
 from io import BytesIO
+from readiness import wait_until_ready
 
 BASE_URL = "http://localhost:5000"
 
@@ -82,18 +83,18 @@ def test_frame_capture():
     print("  ✓ URL loaded")
     
     # Wait for page to fully render
-    time.sleep(2)
+    wait_until_ready(BASE_URL, session_id)
     
-    # Test frame endpoint (PNG image)
+    # Test frame endpoint (JPEG image)
     response = requests.get(f"{BASE_URL}/api/session/{session_id}/frame")
     assert response.status_code == 200, f"Frame capture failed: {response.status_code}"
-    assert response.headers['Content-Type'] == 'image/png', "Response is not a PNG image"
+    assert response.headers['Content-Type'] == 'image/jpeg', "Response is not a JPEG image"
     
-    # Verify it's a valid PNG
+    # Verify it's a valid JPEG
     image_data = response.content
     assert len(image_data) > 0, "Frame data is empty"
-    assert image_data[:8] == b'\x89PNG\r\n\x1a\n', "Not a valid PNG file"
-    print(f"  ✓ Frame captured as PNG ({len(image_data)} bytes)")
+    assert image_data[:3] == b'\xff\xd8\xff', "Not a valid JPEG file"
+    print(f"  ✓ Frame captured as JPEG ({len(image_data)} bytes)")
     
     # Test frame/data endpoint (base64 JSON)
     response = requests.get(f"{BASE_URL}/api/session/{session_id}/frame/data")
@@ -101,12 +102,12 @@ def test_frame_capture():
     data = response.json()
     assert data['success'] == True, "Frame data not successful"
     assert 'frame' in data, "Frame data missing"
-    assert data['format'] == 'png', "Frame format should be PNG"
+    assert data['format'] == 'jpeg', "Frame format should be JPEG"
     
     # Verify base64 encoded data can be decoded
     frame_b64 = data['frame']
     decoded = base64.b64decode(frame_b64)
-    assert decoded[:8] == b'\x89PNG\r\n\x1a\n', "Decoded frame is not a valid PNG"
+    assert decoded[:3] == b'\xff\xd8\xff', "Decoded frame is not a valid JPEG"
     print(f"  ✓ Frame data as base64 JSON ({len(frame_b64)} chars)")
     
     # Clean up
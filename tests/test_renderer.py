@@ -5,6 +5,7 @@ Integration tests for Jiomosa Renderer Service
 import requests
 import time
 import sys
+from readiness import wait_until_ready
 
 BASE_URL = "http://localhost:5000"
 
@@ -55,7 +56,7 @@ def test_session_lifecycle():
     print("  ✓ URL loaded successfully")
     
     # Wait for page to fully load
-    time.sleep(2)
+    wait_until_ready(BASE_URL, session_id)
     
     # Get session info
     print("  Getting session info...")